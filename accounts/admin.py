@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Profile, User, VendorProfile
+from .models import OutboundEmail, Profile, User, VendorProfile
 
 admin.site.register(Profile)
 admin.site.register(User)
-admin.site.register(VendorProfile)
\ No newline at end of file
+admin.site.register(VendorProfile)
+admin.site.register(OutboundEmail)
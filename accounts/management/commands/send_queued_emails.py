@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the outbox instead of exiting once it is drained'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait between polls of an empty outbox'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            sent, failed = send_queued_emails(batch_size)
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed')
+            # A full batch means more mail is probably waiting
+            if sent + failed < batch_size:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
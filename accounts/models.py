@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -54,4 +55,38 @@ class VendorProfile(models.Model):
     is_profile_complete = models.BooleanField(default=False)  # Track if user has completed profile
     
     def __str__(self):
-        return self.business_name
\ No newline at end of file
+        return self.business_name
+
+
+class OutboundEmail(models.Model):
+    """An email waiting in the outbox for the ``send_queued_emails`` worker.
+
+    Requests only insert a row here, so a slow mail server never holds up
+    a page. Queued rows become due at ``next_attempt_at``; the worker
+    pushes that forward while it sends and backs off after failures.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # The worker only ever looks for queued mail that is due
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='queued'), name='outboundemail_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
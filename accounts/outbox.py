@@ -0,0 +1,85 @@
+"""Queue emails from requests and deliver them in batches from a worker."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = 5
+# A claimed email goes back to the queue if its worker dies mid-batch
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """Queue an email for the worker, in place of ``send_mail``."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def retry_delay(attempts):
+    """Back off exponentially from one minute, capped at six hours."""
+    return timedelta(minutes=min(2 ** (attempts - 1), 360))
+
+
+def claim_batch(batch_size, now):
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                status='queued',
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    return emails
+
+
+def send_queued_emails(batch_size=100):
+    """Send one batch of due emails over a single connection.
+
+    Returns ``(sent, failed)``. Failed emails are retried with backoff until
+    they have been tried MAX_ATTEMPTS times.
+    """
+    now = timezone.now()
+    emails = claim_batch(batch_size, now)
+    if not emails:
+        return (0, 0)
+
+    sent = []
+    failures = []
+    connection = get_connection()
+    try:
+        connection.open()
+        for email in emails:
+            try:
+                EmailMessage(
+                    email.subject, email.body, email.from_email, email.to, connection=connection
+                ).send()
+                sent.append(email.pk)
+            except Exception as e:
+                failures.append((email, e))
+    except Exception as e:
+        # Couldn't reach the mail server at all
+        failures.extend((email, e) for email in emails if email.pk not in sent)
+    finally:
+        connection.close()
+
+    finished = timezone.now()
+    OutboundEmail.objects.filter(pk__in=sent).update(status='sent', sent_at=finished)
+    for email, error in failures:
+        email.attempts += 1
+        email.last_error = str(error)
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = 'failed'
+        else:
+            email.next_attempt_at = finished + retry_delay(email.attempts)
+        email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+    return (len(sent), len(failures))
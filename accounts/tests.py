@@ -1,3 +1,64 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import OutboundEmail, User
+from .outbox import MAX_ATTEMPTS, enqueue_email, send_queued_emails
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('Relay unavailable')
+
+
+class OutboxTests(TestCase):
+    def test_registration_only_enqueues(self):
+        response = self.client.post(reverse('accounts:register'), {
+            'username': 'guest', 'email': 'guest@example.com',
+            'password1': 'a-long-Passw0rd', 'password2': 'a-long-Passw0rd',
+        })
+        self.assertRedirects(response, reverse('accounts:verify_otp'), fetch_redirect_response=False)
+        self.assertEqual(mail.outbox, [])
+        email = OutboundEmail.objects.get()
+        user = User.objects.get(email='guest@example.com')
+        self.assertEqual(email.to, ['guest@example.com'])
+        self.assertIn(user.otp_code, email.body)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.CountingBackend')
+    def test_batch_shares_one_connection(self):
+        CountingBackend.opened = 0
+        for i in range(3):
+            enqueue_email('Hello', 'Body', [f'guest{i}@example.com'])
+        self.assertEqual(send_queued_emails(), (3, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboundEmail.objects.filter(status='sent').count(), 3)
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    def test_failures_back_off_then_give_up(self):
+        email = enqueue_email('Hello', 'Body', ['guest@example.com'])
+        with override_settings(EMAIL_BACKEND='accounts.tests.FailingBackend'):
+            self.assertEqual(send_queued_emails(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('queued', 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            # Not due again until the backoff has passed
+            self.assertEqual(send_queued_emails(), (0, 0))
+            for _ in range(MAX_ATTEMPTS - 1):
+                OutboundEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+                send_queued_emails()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', MAX_ATTEMPTS))
+        self.assertIn('Relay unavailable', email.last_error)
@@ -10,7 +10,7 @@ from .models import Profile, User, VendorProfile
 from .forms import HostRegistrationForm, ResetPasswordForm, ForgotPasswordForm, UserLoginForm, UserCreationForm, UserProfileForm, UserRegistrationForm, OTPVerificationForm, VendorProfileForm
 from django.contrib.auth.views import PasswordResetView, PasswordResetDoneView, PasswordResetConfirmView, PasswordResetCompleteView
 from django.contrib import messages
-from django.core.mail import send_mail
+from .outbox import enqueue_email
 from django.urls import reverse_lazy
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib.auth import login, logout, authenticate
@@ -61,13 +61,12 @@ def register_host(request):
             user.otp_code = str(random.randint(100000, 999999))  # Generate OTP
             user.save()
 
-            # Send OTP Email
-            send_mail(
+            # Queue the OTP email; the outbox worker sends it
+            enqueue_email(
                 'OTP Verification for Host Registration',
                 f'Your OTP Code is {user.otp_code}. Use this to verify your email.',
-                'noreply@example.com',
                 [user.email],
-                fail_silently=False,
+                'noreply@example.com',
             )
 
             request.session['email'] = user.email  # Store email for OTP verification
@@ -172,13 +171,12 @@ def register(request):
             user.otp_code = str(random.randint(100000, 999999))  # Generate OTP
             user.save()
 
-            # Send OTP Email
-            send_mail(
+            # Queue the OTP email; the outbox worker sends it
+            enqueue_email(
                 'OTP Verification',
                 f'Your OTP Code is {user.otp_code}',
-                'noreply@example.com',
                 [user.email],
-                fail_silently=False,
+                'noreply@example.com',
             )
             request.session['email'] = user.email  # Store email in session for OTP verification
             return redirect('accounts:verify_otp')  # Add namespace here
@@ -365,10 +363,11 @@ def edit_profile(request):
 #                Dashboard Views
 #---------------------------------------------------------------
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Avg, Sum
+from django.db.models import Sum, F, FloatField
 from django.utils import timezone
 from properties.models import Property, Room
 from bookings.models import Booking
+from bookings.rollups import rollup_totals
 from datetime import timedelta
 
 @login_required
@@ -390,14 +389,21 @@ def vendor_dashboard(request):
     now = timezone.now()
     thirty_days_ago = now - timedelta(days=30)
     
-    monthly_stats = Booking.objects.filter(
-        room__property__owner=request.user,
-        created_at__gte=thirty_days_ago,
-        status='confirmed'
-    ).aggregate(
-        total_bookings=Count('id'),
-        total_revenue=Sum('total_amount'),
-        avg_rating=Avg('room__property__reviews__rating')
+    # Read from the daily rollups instead of the vendor's raw bookings
+    rollups = rollup_totals(request.user, since=thirty_days_ago.date()).values()
+    monthly_stats = {
+        'total_bookings': sum(rollup['confirmed'] for rollup in rollups),
+        'total_revenue': sum(rollup['revenue'] for rollup in rollups),
+    }
+    # Review-weighted rating across the vendor's properties, from the summary
+    # columns rather than a bookings x reviews join
+    rating_totals = properties.aggregate(
+        rating_sum=Sum(F('avg_rating') * F('review_count'), output_field=FloatField()),
+        review_count=Sum('review_count')
+    )
+    monthly_stats['avg_rating'] = (
+        rating_totals['rating_sum'] / rating_totals['review_count']
+        if rating_totals['review_count'] else None
     )
     
     context = {
@@ -0,0 +1,208 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from pano.caching import get_cache, make_key
+from properties.caching import property_tag
+from properties.models import Room
+from .models import RoomNight
+
+CALENDAR_DAYS = 60
+# Holds lapse without touching the availability tag, so cached calendars
+# only live long enough for that to go unnoticed
+CALENDAR_TIMEOUT = 60
+
+
+def stay_dates(check_in, check_out):
+    """Return every night of a stay, check-in inclusive and check-out exclusive."""
+    return [check_in + timedelta(days=offset) for offset in range((check_out - check_in).days)]
+
+
+class RoomUnavailable(Exception):
+    """Raised when a room has no free unit for one of the nights of a stay."""
+
+
+def hold_expiry():
+    """Return when a hold placed now should stop blocking the room."""
+    return timezone.now() + timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+
+
+def live_nights(now=None):
+    """Filter for ledger rows that still block a unit: bookings and unexpired holds."""
+    return Q(hold_expires_at__isnull=True) | Q(hold_expires_at__gt=now or timezone.now())
+
+
+def sync_room_nights(booking, previous=None):
+    """Rewrite the ledger rows of ``booking`` to match its room, dates and status.
+
+    Every night is assigned the lowest unit number not already taken, and the
+    ``(room, date, unit)`` unique constraint rejects concurrent writers that
+    picked the same unit, so a room can never be sold past ``total_rooms``.
+    Units still held by expired holds are reclaimed on the way.
+    """
+    stay, hold_expires_at = booking._ledger_key()
+    if previous and previous[0] == stay:
+        # Only the hold changed, e.g. a pending booking was paid for
+        RoomNight.objects.filter(booking=booking).update(hold_expires_at=hold_expires_at)
+        return
+    
+    RoomNight.objects.filter(booking=booking).delete()
+    if not booking.occupies_room:
+        return
+    
+    nights = stay_dates(booking.check_in_date, booking.check_out_date)
+    RoomNight.objects.filter(
+        room_id=booking.room_id,
+        date__in=nights,
+        hold_expires_at__lte=timezone.now()
+    ).delete()
+    taken = defaultdict(set)
+    for night, unit in RoomNight.objects.filter(
+        room_id=booking.room_id,
+        date__in=nights
+    ).values_list('date', 'unit'):
+        taken[night].add(unit)
+    
+    rows = []
+    for night in nights:
+        unit = next((unit for unit in range(booking.room.total_rooms) if unit not in taken[night]), None)
+        if unit is None:
+            raise RoomUnavailable(f'{booking.room} is fully booked on {night:%Y-%m-%d}.')
+        rows.append(RoomNight(
+            room_id=booking.room_id, booking=booking, date=night, unit=unit,
+            hold_expires_at=booking.hold_expires_at
+        ))
+    RoomNight.objects.bulk_create(rows)
+
+
+def reserve_booking(booking, attempts=3):
+    """Save ``booking`` and claim its room-nights atomically.
+
+    The room row is locked with ``SELECT ... FOR UPDATE`` so reservations for
+    the same room type queue up instead of racing; on backends without row
+    locks the ledger's unique constraint still rejects the loser, which is
+    retried against the fresh ledger before giving up.
+    """
+    adding = booking._state.adding
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                list(Room.objects.select_for_update().filter(pk=booking.room_id))
+                booking.save()
+            return booking
+        except IntegrityError:
+            if adding:
+                booking.pk = None
+                booking._state.adding = True
+            booking._ledger_state = None
+            if attempt == attempts - 1:
+                raise RoomUnavailable(f'{booking.room} was booked by someone else, please try again.')
+
+
+def with_free_units(rooms, check_in, check_out):
+    """Annotate a ``Room`` queryset with ``booked_units`` and ``free_units``.
+
+    ``booked_units`` is the number of units taken on the busiest night of the
+    stay, so ``free_units`` is how many more guests can book the whole stay.
+    Expired holds are ignored even before the sweeper has released them.
+    """
+    busiest_night = RoomNight.objects.filter(
+        live_nights(),
+        room=OuterRef('pk'),
+        date__gte=check_in,
+        date__lt=check_out
+    ).values('date').annotate(
+        units=Count('pk')
+    ).order_by('-units').values('units')[:1]
+    
+    return rooms.annotate(
+        booked_units=Coalesce(Subquery(busiest_night, output_field=IntegerField()), 0)
+    ).annotate(
+        free_units=F('total_rooms') - F('booked_units')
+    )
+
+
+def free_units(room, check_in, check_out):
+    """Return how many units of ``room`` are free for the whole stay."""
+    annotated = with_free_units(Room.objects.filter(pk=room.pk), check_in, check_out)
+    return max(annotated.values_list('free_units', flat=True).first() or 0, 0)
+
+
+def find_available_room(property_id, room_type, check_in, check_out):
+    """Return the cheapest room of ``room_type`` with a free unit, or ``None``."""
+    rooms = Room.objects.filter(
+        property_id=property_id,
+        room_type=room_type,
+        is_available=True
+    )
+    return with_free_units(rooms, check_in, check_out).filter(
+        free_units__gt=0
+    ).order_by('price_per_night', 'id').first()
+
+
+def cheapest_free_rooms(properties, check_in, check_out, guests=1):
+    """Map each property id to its cheapest room with a free unit for the stay.
+
+    ``properties`` may be a list of ids or a ``Property`` queryset; either way
+    the lookup runs as one query, however many properties are requested.
+    """
+    rooms = Room.objects.filter(
+        property__in=properties,
+        is_available=True,
+        capacity__gte=guests
+    )
+    rooms = with_free_units(rooms, check_in, check_out).filter(
+        free_units__gt=0
+    ).order_by('property_id', 'price_per_night', 'id')
+    
+    cheapest = {}
+    for room in rooms:
+        cheapest.setdefault(room.property_id, room)
+    return cheapest
+
+
+def build_availability_calendar(property_id, start, days=CALENDAR_DAYS):
+    """Free units per night for each room type of a property, from ``start`` for ``days`` nights.
+
+    Units are summed over the bookable rooms of each type, from one grouped
+    query over the room-night ledger.
+    """
+    rooms = list(Room.objects.filter(property_id=property_id, is_available=True).order_by('price_per_night', 'pk'))
+    booked = defaultdict(int)
+    for room_id, night, units in RoomNight.objects.filter(
+        live_nights(),
+        room__in=[room.pk for room in rooms],
+        date__gte=start,
+        date__lt=start + timedelta(days=days)
+    ).values('room', 'date').annotate(units=Count('pk')).values_list('room', 'date', 'units'):
+        booked[room_id, night] = units
+    
+    room_types = {}
+    for room in rooms:
+        entry = room_types.setdefault(room.room_type, {
+            'name': room.get_room_type_display(),
+            'price': float(room.price_per_night),
+            'total': 0,
+            'free': [0] * days,
+        })
+        entry['total'] += room.total_rooms
+        for offset in range(days):
+            night = start + timedelta(days=offset)
+            entry['free'][offset] += max(room.total_rooms - booked[room.pk, night], 0)
+    return {'start': start.isoformat(), 'days': days, 'room_types': room_types}
+
+
+def availability_calendar(property_id, days=CALENDAR_DAYS):
+    """The calendar from today, cached until the property's availability changes."""
+    start = timezone.localdate()
+    key = make_key('availability', f'{property_id}:{start}:{days}', [property_tag(property_id, 'availability')])
+    calendar = get_cache().get(key)
+    if calendar is None:
+        calendar = build_availability_calendar(property_id, start, days)
+        get_cache().set(key, calendar, CALENDAR_TIMEOUT)
+    return calendar
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bookings.models import Booking, RoomNight
+
+
+class Command(BaseCommand):
+    help = 'Expires pending bookings whose hold has run out and releases their room-nights'
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        
+        with transaction.atomic():
+            # One UPDATE for every abandoned checkout, however many there are
+            expired = Booking.objects.filter(
+                status='pending',
+                hold_expires_at__lte=now
+            ).update(status='expired', updated_at=now)
+            
+            released, _ = RoomNight.objects.filter(hold_expires_at__lte=now).delete()
+        
+        self.stdout.write(f'Expired {expired} holds and released {released} room-nights')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from bookings.rollups import roll_up_bookings
+
+
+class Command(BaseCommand):
+    help = 'Rolls bookings changed since the last run up into daily per-property totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Discard all rollups and rebuild them from every booking'
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = roll_up_bookings(full=options['full'])
+        self.stdout.write(f'Rebuilt {rebuilt} property-days')
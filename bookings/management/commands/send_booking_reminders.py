@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from bookings.reminders import send_booking_reminders
+
+
+class Command(BaseCommand):
+    help = 'Emails check-in reminders for upcoming confirmed bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        sent, failed = send_booking_reminders(options['batch_size'])
+        self.stdout.write(f'Sent {sent} reminders, {failed} failed')
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:53
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_room_nights(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    RoomNight = apps.get_model('bookings', 'RoomNight')
+    bookings = Booking.objects.filter(status__in=['pending', 'confirmed', 'completed'])
+    RoomNight.objects.bulk_create([
+        RoomNight(room_id=booking.room_id, booking_id=booking.id,
+                  date=booking.check_in_date + timedelta(days=offset))
+        for booking in bookings.iterator()
+        for offset in range((booking.check_out_date - booking.check_in_date).days)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+        ('properties', '0002_propertyvideo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='bookings.booking')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='properties.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['room', 'date'], name='roomnight_room_date_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_room_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+def number_units(apps, schema_editor):
+    # Give nights already in the ledger distinct units per room and date
+    RoomNight = apps.get_model('bookings', 'RoomNight')
+    last = None
+    unit = 0
+    updated = []
+    for night in RoomNight.objects.order_by('room_id', 'date', 'booking_id').iterator():
+        unit = unit + 1 if (night.room_id, night.date) == last else 0
+        last = (night.room_id, night.date)
+        if unit:
+            night.unit = unit
+            updated.append(night)
+    RoomNight.objects.bulk_update(updated, ['unit'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_roomnight'),
+        ('properties', '0002_propertyvideo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='roomnight',
+            name='roomnight_room_date_idx',
+        ),
+        migrations.AddField(
+            model_name='roomnight',
+            name='unit',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(number_units, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='roomnight',
+            constraint=models.UniqueConstraint(fields=('room', 'date', 'unit'), name='roomnight_unique_unit'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:56
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def hold_pending_bookings(apps, schema_editor):
+    """Give checkouts left pending before holds existed the usual hold.
+
+    Counted from when each booking was made, so abandoned ones are expired
+    and their room-nights released straight away.
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    RoomNight = apps.get_model('bookings', 'RoomNight')
+    now = timezone.now()
+    hold = timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+    stale = Booking.objects.filter(status='pending', created_at__lte=now - hold)
+    RoomNight.objects.filter(booking__in=stale).delete()
+    stale.update(status='expired', updated_at=now)
+    # The few still inside their hold keep what is left of it
+    for pk, created_at in Booking.objects.filter(status='pending').values_list('pk', 'created_at'):
+        Booking.objects.filter(pk=pk).update(hold_expires_at=created_at + hold)
+        RoomNight.objects.filter(booking_id=pk).update(hold_expires_at=created_at + hold)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_roomnight_unit'),
+        ('properties', '0002_propertyvideo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='roomnight',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('completed', 'Completed'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['hold_expires_at'], name='booking_pending_hold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomnight',
+            index=models.Index(condition=models.Q(('hold_expires_at__isnull', False)), fields=['hold_expires_at'], name='roomnight_hold_idx'),
+        ),
+        migrations.RunPython(hold_pending_bookings, migrations.RunPython.noop),
+    ]
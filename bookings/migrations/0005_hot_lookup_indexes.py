@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_holds'),
+        ('properties', '0003_hot_lookup_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room', 'status', 'check_in_date', 'check_out_date'], name='booking_room_status_dates_idx'),
+        ),
+    ]
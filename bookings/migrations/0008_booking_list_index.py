@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_reminders'),
+        ('properties', '0010_video_youtube_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'check_in_date'], name='booking_user_check_in_idx'),
+        ),
+    ]
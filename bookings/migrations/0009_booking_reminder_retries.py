@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_booking_list_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='reminder_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='reminder_next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
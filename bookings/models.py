@@ -1,6 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from accounts.models import User
-from properties.models import Room
+from properties.models import Property, Room
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
@@ -10,8 +10,13 @@ class Booking(models.Model):
         ('confirmed', 'Confirmed'),
         ('cancelled', 'Cancelled'),
         ('completed', 'Completed'),
+        ('expired', 'Expired'),
     )
     
+    # Statuses that hold a unit of the room for every night of the stay
+    OCCUPYING_STATUSES = ('pending', 'confirmed', 'completed')
+    LEDGER_FIELDS = ('room_id', 'check_in_date', 'check_out_date', 'status', 'hold_expires_at')
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
     check_in_date = models.DateField()
@@ -20,6 +25,13 @@ class Booking(models.Model):
     total_nights = models.PositiveIntegerField()
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # A pending booking only holds its room until this time; null holds indefinitely
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    # Set by send_booking_reminders once the check-in reminder has gone out
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+    # Failed reminder sends so far, and when the next one may be tried
+    reminder_attempts = models.PositiveSmallIntegerField(default=0)
+    reminder_next_attempt_at = models.DateTimeField(null=True, blank=True)
     
     # Guest information
     guest_name = models.CharField(max_length=200)
@@ -40,16 +52,124 @@ class Booking(models.Model):
         if self.guests > self.room.capacity:
             raise ValidationError(f'Room capacity is {self.room.capacity} guests.')
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._ledger_state = instance._ledger_key()
+        return instance
+    
+    def _ledger_key(self):
+        # Read from __dict__ so deferred fields don't trigger extra queries
+        room_id, check_in, check_out, status, hold_expires_at = (
+            self.__dict__.get(field) for field in self.LEDGER_FIELDS
+        )
+        stay = (room_id, check_in, check_out, status and status in self.OCCUPYING_STATUSES)
+        return (stay, hold_expires_at)
+    
+    @property
+    def occupies_room(self):
+        return self.status in self.OCCUPYING_STATUSES
+    
+    @property
+    def hold_expired(self):
+        return (
+            self.status == 'pending'
+            and self.hold_expires_at is not None
+            and self.hold_expires_at <= timezone.now()
+        )
+    
     def save(self, *args, **kwargs):
+        from .availability import sync_room_nights
+        
         self.total_nights = (self.check_out_date - self.check_in_date).days
         self.total_amount = self.room.price_per_night * self.total_nights
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Only touch the ledger when the room, dates, status or hold changed
+            previous = getattr(self, '_ledger_state', None)
+            if self._ledger_key() != previous:
+                sync_room_nights(self, previous)
+                self._ledger_state = self._ledger_key()
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.room.property.name}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Conflict and revenue lookups filter on room and status, then dates
+            models.Index(fields=['room', 'status', 'check_in_date', 'check_out_date'], name='booking_room_status_dates_idx'),
+            # Lets the hold sweeper find expired holds without scanning bookings
+            models.Index(fields=['hold_expires_at'], condition=models.Q(status='pending'), name='booking_pending_hold_idx'),
+            # Lets the analytics rollup pick up only rows changed since its last run
+            models.Index(fields=['updated_at'], name='booking_updated_idx'),
+            # Only confirmed bookings still waiting for their check-in reminder
+            models.Index(
+                fields=['check_in_date'],
+                condition=models.Q(status='confirmed', reminder_sent_at__isnull=True),
+                name='booking_reminder_due_idx'
+            ),
+            # A guest's booking list, paged in check-in order
+            models.Index(fields=['user', 'check_in_date'], name='booking_user_check_in_idx'),
+        ]
+
+class RoomNight(models.Model):
+    """One unit of a room type occupied by a booking for a single night.
+
+    This is a denormalized ledger of ``Booking`` rows kept in sync by
+    ``Booking.save()``, so availability is a range scan over
+    ``(room, date)`` instead of an overlap scan of the bookings table.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='nights')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='nights')
+    date = models.DateField()
+    # Which of the room's ``total_rooms`` units this night occupies
+    unit = models.PositiveIntegerField(default=0)
+    # Copied from the booking so availability can skip expired holds without a join
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'date', 'unit'], name='roomnight_unique_unit'),
+        ]
+        indexes = [
+            models.Index(fields=['hold_expires_at'], condition=models.Q(hold_expires_at__isnull=False), name='roomnight_hold_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.room} - {self.date}"
+
+class DailyBookingRollup(models.Model):
+    """Booking totals for one property, bucketed by the day bookings were made.
+
+    Rebuilt incrementally by the ``rollup_bookings`` command so dashboards
+    read one row per property per day instead of the booking history.
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    bookings = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    confirmed = models.PositiveIntegerField(default=0)
+    cancellations = models.PositiveIntegerField(default=0)
+    # Revenue and room-nights count confirmed bookings only
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    room_nights = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'date'], name='dailybookingrollup_unique_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.property} - {self.date}"
+
+class RollupWatermark(models.Model):
+    """How far an incremental rollup has read its source table."""
+    name = models.CharField(max_length=50, unique=True)
+    processed_until = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.name} @ {self.processed_until}"
 
 class Payment(models.Model):
     PAYMENT_METHODS = (
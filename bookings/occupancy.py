@@ -0,0 +1,45 @@
+"""Occupancy over a date window, counted from the room-night ledger."""
+from datetime import timedelta
+
+from django.db.models import Count, Sum
+
+from properties.models import Room
+from .models import RoomNight
+
+# Holds and pending bookings reserve a unit but haven't sold it
+SOLD_STATUSES = ('confirmed', 'completed')
+
+
+def occupancy(properties, start, end):
+    """Sold and available unit-nights for ``properties`` from ``start`` up to ``end``.
+
+    ``properties`` is a queryset or list of property ids. The ledger has one
+    row per unit per night, so stays are clipped to the window by the date
+    filter alone, and each day is counted by the database. Returns the
+    totals for the window along with a ``days`` series for charts, which
+    always has one entry per night, including nights with nothing sold.
+    """
+    units = Room.objects.filter(property__in=properties).aggregate(units=Sum('total_rooms'))['units'] or 0
+    sold_by_day = dict(
+        RoomNight.objects.filter(
+            room__property__in=properties,
+            date__gte=start,
+            date__lt=end,
+            booking__status__in=SOLD_STATUSES
+        ).values('date').annotate(sold=Count('id')).order_by().values_list('date', 'sold')
+    )
+
+    days = []
+    day = start
+    while day < end:
+        sold = sold_by_day.get(day, 0)
+        days.append({'date': day, 'sold': sold, 'available': units, 'rate': rate(sold, units)})
+        day += timedelta(days=1)
+
+    sold = sum(sold_by_day.values())
+    available = units * len(days)
+    return {'sold': sold, 'available': available, 'rate': rate(sold, available), 'days': days}
+
+
+def rate(sold, available):
+    return sold / available * 100 if available else 0
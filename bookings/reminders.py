@@ -0,0 +1,98 @@
+"""Check-in reminder emails for upcoming bookings."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from accounts.outbox import retry_delay
+
+from .models import Booking
+
+MAX_ATTEMPTS = 5
+# A claimed reminder comes due again if its run dies mid-batch
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def due_reminders(today=None, now=None):
+    """Confirmed bookings checking in within BOOKING_REMINDER_DAYS, not yet reminded and due a try."""
+    now = now or timezone.now()
+    today = today or now.date()
+    return Booking.objects.filter(
+        Q(reminder_next_attempt_at__isnull=True) | Q(reminder_next_attempt_at__lte=now),
+        status='confirmed',
+        reminder_sent_at__isnull=True,
+        reminder_attempts__lt=MAX_ATTEMPTS,
+        check_in_date__gte=today,
+        check_in_date__lte=today + timedelta(days=settings.BOOKING_REMINDER_DAYS)
+    )
+
+
+def claim_reminders(batch_size, now):
+    with transaction.atomic():
+        bookings = list(
+            due_reminders(now=now).select_related('room__property').select_for_update(
+                skip_locked=True, of=('self',)
+            ).order_by('check_in_date', 'pk')[:batch_size]
+        )
+        Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).update(
+            reminder_next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    return bookings
+
+
+def send_reminder_batch(connection, batch_size, subject_template, body_template):
+    """Claim, send and mark one batch, returning ``(claimed, sent, failed)``.
+
+    The batch is claimed and marked in two short transactions, so the
+    database isn't locked while the mail server is slow. Failed reminders
+    are retried with backoff until they have been tried MAX_ATTEMPTS times.
+    """
+    bookings = claim_reminders(batch_size, timezone.now())
+    sent = []
+    failed = []
+    for booking in bookings:
+        context = {'booking': booking}
+        message = EmailMessage(
+            subject_template.render(context).strip(),
+            body_template.render(context),
+            settings.DEFAULT_FROM_EMAIL,
+            [booking.guest_email],
+            connection=connection,
+        )
+        try:
+            message.send()
+        except Exception:
+            failed.append(booking)
+        else:
+            sent.append(booking)
+
+    finished = timezone.now()
+    for booking in sent:
+        booking.reminder_sent_at = finished
+    for booking in failed:
+        booking.reminder_attempts += 1
+        booking.reminder_next_attempt_at = finished + retry_delay(booking.reminder_attempts)
+    with transaction.atomic():
+        Booking.objects.bulk_update(sent, ['reminder_sent_at'])
+        Booking.objects.bulk_update(failed, ['reminder_attempts', 'reminder_next_attempt_at'])
+    return (len(bookings), len(sent), len(failed))
+
+
+def send_booking_reminders(batch_size=200):
+    """Send every due reminder over one connection; safe to run every minute."""
+    subject_template = get_template('bookings/email/reminder_subject.txt')
+    body_template = get_template('bookings/email/reminder.txt')
+    total_sent = total_failed = 0
+    with get_connection() as connection:
+        while True:
+            claimed, sent, failed = send_reminder_batch(connection, batch_size, subject_template, body_template)
+            total_sent += sent
+            total_failed += failed
+            # Failures are backed off, so the next batch moves on past them
+            if claimed < batch_size:
+                break
+    return (total_sent, total_failed)
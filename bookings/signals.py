@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from properties.caching import invalidate_property
+from .models import Booking
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def expire_availability(sender, instance, **kwargs):
+    invalidate_property(instance.room.property_id, 'availability', listed=False)
@@ -1,3 +1,453 @@
-from django.test import TestCase
+import threading
+from io import StringIO
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from pano.caching import get_cache
+from properties.models import Property, Room
+from .availability import (
+    CALENDAR_DAYS, RoomUnavailable, build_availability_calendar, find_available_room, free_units, reserve_booking
+)
+from .occupancy import occupancy
+from .reminders import MAX_ATTEMPTS, send_booking_reminders
+from .views import BookingListView
+from .models import Booking, DailyBookingRollup, RoomNight
+
+
+def make_property(owner, **kwargs):
+    defaults = {
+        'name': 'Lakeside Lodge', 'property_type': 'lodge', 'description': 'A lodge',
+        'address': '1 Lake Road', 'city': 'Lusaka', 'state': 'Lusaka',
+        'country': 'Zambia', 'postal_code': '10101', 'phone': '0970000000',
+        'email': 'lodge@example.com',
+    }
+    defaults.update(kwargs)
+    return Property.objects.create(owner=owner, **defaults)
+
+
+def make_room(property_obj, **kwargs):
+    defaults = {
+        'room_type': 'double', 'name': 'Double Room', 'description': 'Two beds',
+        'price_per_night': 100, 'capacity': 2, 'total_rooms': 1,
+    }
+    defaults.update(kwargs)
+    return Room.objects.create(property=property_obj, **defaults)
+
+
+def make_booking(user, room, check_in, nights=2, **kwargs):
+    defaults = {
+        'guests': 1, 'guest_name': 'Guest', 'guest_email': 'guest@example.com',
+        'guest_phone': '0970000001', 'status': 'confirmed', 'total_amount': 0,
+    }
+    defaults.update(kwargs)
+    return Booking.objects.create(
+        user=user, room=room, check_in_date=check_in,
+        check_out_date=check_in + timedelta(days=nights),
+        total_nights=nights, **defaults
+    )
+
+
+class RoomNightLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        self.property = make_property(self.user)
+        self.room = make_room(self.property, total_rooms=3)
+        self.check_in = timezone.now().date() + timedelta(days=10)
+
+    def test_booking_writes_one_row_per_night(self):
+        booking = make_booking(self.user, self.room, self.check_in, nights=3)
+        self.assertEqual(
+            list(booking.nights.order_by('date').values_list('date', flat=True)),
+            [self.check_in + timedelta(days=i) for i in range(3)]
+        )
+
+    def test_cancellation_releases_nights(self):
+        booking = make_booking(self.user, self.room, self.check_in)
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertFalse(RoomNight.objects.filter(booking=booking).exists())
+
+    def test_date_change_moves_nights(self):
+        booking = make_booking(self.user, self.room, self.check_in)
+        booking.check_in_date += timedelta(days=5)
+        booking.check_out_date += timedelta(days=5)
+        booking.save()
+        self.assertEqual(booking.nights.filter(date__lt=booking.check_in_date).count(), 0)
+        self.assertEqual(booking.nights.count(), 2)
+
+    def test_status_only_change_skips_ledger(self):
+        booking = make_booking(self.user, self.room, self.check_in, status='pending')
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.status = 'confirmed'
+        with CaptureQueriesContext(connection) as queries:
+            booking.save()
+        # The ledger rows are already correct, so only the booking is written
+        self.assertFalse(any('bookings_roomnight' in query['sql'] for query in queries))
+        self.assertEqual(booking.nights.count(), 2)
+
+    def test_free_units_respects_total_rooms(self):
+        check_out = self.check_in + timedelta(days=2)
+        make_booking(self.user, self.room, self.check_in)
+        make_booking(self.user, self.room, self.check_in + timedelta(days=1))
+        self.assertEqual(free_units(self.room, self.check_in, check_out), 1)
+        make_booking(self.user, self.room, self.check_in)
+        self.assertEqual(free_units(self.room, self.check_in, check_out), 0)
+        # The last night of the second booking doesn't overlap this stay
+        self.assertEqual(free_units(self.room, check_out, check_out + timedelta(days=1)), 2)
+
+    def test_find_available_room_is_a_single_query(self):
+        cheap = make_room(self.property, price_per_night=50, total_rooms=1)
+        make_booking(self.user, cheap, self.check_in)
+        with self.assertNumQueries(1):
+            room = find_available_room(self.property.pk, 'double', self.check_in, self.check_in + timedelta(days=2))
+        self.assertEqual(room, self.room)
+        self.assertEqual(room.free_units, 3)
+
+    def test_check_availability_endpoint(self):
+        for _ in range(3):
+            make_booking(self.user, self.room, self.check_in)
+        response = self.client.get(reverse('bookings:check_availability'), {
+            'room_type': 'double',
+            'property_id': self.property.pk,
+            'check_in': self.check_in.isoformat(),
+            'check_out': (self.check_in + timedelta(days=2)).isoformat(),
+        })
+        self.assertEqual(response.json(), {'available': False})
+
+
+class ReserveBookingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        self.room = make_room(make_property(self.user), total_rooms=2)
+        self.check_in = timezone.now().date() + timedelta(days=3)
+
+    def test_units_are_distinct_per_night(self):
+        first = make_booking(self.user, self.room, self.check_in)
+        second = make_booking(self.user, self.room, self.check_in + timedelta(days=1))
+        self.assertEqual(set(first.nights.values_list('unit', flat=True)), {0})
+        self.assertEqual(
+            list(second.nights.order_by('date').values_list('unit', flat=True)), [1, 0]
+        )
+
+    def test_overbooking_is_rejected(self):
+        make_booking(self.user, self.room, self.check_in)
+        make_booking(self.user, self.room, self.check_in)
+        booking = Booking(
+            user=self.user, room=self.room, check_in_date=self.check_in,
+            check_out_date=self.check_in + timedelta(days=1), guests=1,
+            guest_name='Late', guest_email='late@example.com', guest_phone='1'
+        )
+        with self.assertRaises(RoomUnavailable):
+            reserve_booking(booking)
+        self.assertEqual(Booking.objects.count(), 2)
+
+
+class BookingHoldTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        self.room = make_room(make_property(self.user), total_rooms=1)
+        self.check_in = timezone.now().date() + timedelta(days=3)
+        self.check_out = self.check_in + timedelta(days=2)
+
+    def hold(self, minutes):
+        return make_booking(
+            self.user, self.room, self.check_in, status='pending',
+            hold_expires_at=timezone.now() + timedelta(minutes=minutes)
+        )
+
+    def test_live_hold_blocks_the_room(self):
+        self.hold(10)
+        self.assertEqual(free_units(self.room, self.check_in, self.check_out), 0)
+
+    def test_expired_hold_is_ignored_before_the_sweep(self):
+        self.hold(-1)
+        self.assertEqual(free_units(self.room, self.check_in, self.check_out), 1)
+
+    def test_new_booking_reclaims_expired_hold(self):
+        self.hold(-1)
+        booking = make_booking(self.user, self.room, self.check_in)
+        self.assertEqual(booking.nights.count(), 2)
+
+    def test_payment_turns_hold_into_booking(self):
+        booking = self.hold(10)
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.status = 'confirmed'
+        booking.hold_expires_at = None
+        booking.save()
+        self.assertFalse(booking.nights.filter(hold_expires_at__isnull=False).exists())
+        call_command('release_expired_holds', stdout=StringIO())
+        self.assertEqual(booking.nights.count(), 2)
+
+    def test_sweeper_releases_expired_holds_in_bulk(self):
+        expired = [self.hold(-5), self.hold(-1)]
+        live = self.hold(10)
+        with self.assertNumQueries(4):
+            call_command('release_expired_holds', stdout=StringIO())
+        self.assertEqual(
+            set(Booking.objects.filter(status='expired').values_list('pk', flat=True)),
+            {booking.pk for booking in expired}
+        )
+        self.assertEqual(set(RoomNight.objects.values_list('booking_id', flat=True)), {live.pk})
+
+    def test_expired_hold_cannot_be_paid(self):
+        booking = self.hold(-1)
+        self.client.force_login(self.user)
+        self.client.post(reverse('bookings:payment', args=[booking.pk]), {'payment_method': 'paypal'})
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'pending')
+
+
+class AvailabilityCalendarTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        self.property = make_property(self.user)
+        self.double = make_room(self.property, total_rooms=2)
+        self.other_double = make_room(self.property, price_per_night=120, total_rooms=1)
+        self.suite = make_room(self.property, room_type='suite', total_rooms=1)
+        make_room(self.property, room_type='family', is_available=False)
+        self.today = timezone.localdate()
+        self.url = reverse('properties:property_availability', args=[self.property.pk])
+
+    def test_free_units_per_night_by_room_type(self):
+        make_booking(self.user, self.double, self.today + timedelta(days=1), nights=2)
+        make_booking(self.user, self.other_double, self.today + timedelta(days=2))
+        make_booking(self.user, self.suite, self.today, status='cancelled')
+        make_booking(
+            self.user, self.suite, self.today, status='pending',
+            hold_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        with self.assertNumQueries(2):
+            calendar = build_availability_calendar(self.property.pk, self.today, days=5)
+        self.assertEqual(set(calendar['room_types']), {'double', 'suite'})
+        self.assertEqual(calendar['room_types']['double']['total'], 3)
+        self.assertEqual(calendar['room_types']['double']['free'], [3, 2, 1, 2, 3])
+        self.assertEqual(calendar['room_types']['suite']['free'], [1] * 5)
+
+    def test_endpoint_is_cached_until_a_booking_changes(self):
+        self.assertEqual(len(self.client.get(self.url).json()['room_types']['suite']['free']), CALENDAR_DAYS)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        make_booking(self.user, self.suite, self.today)
+        calendar = self.client.get(self.url).json()
+        self.assertEqual(calendar['room_types']['suite']['free'][:3], [0, 0, 1])
+
+
+class OccupancyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        self.property = make_property(self.user)
+        self.double = make_room(self.property, total_rooms=3)
+        self.suite = make_room(self.property, room_type='suite', total_rooms=1)
+        self.start = timezone.now().date() + timedelta(days=10)
+        self.end = self.start + timedelta(days=4)
+
+    def test_stays_are_clipped_to_the_window(self):
+        make_booking(self.user, self.double, self.start - timedelta(days=2), nights=3)
+        make_booking(self.user, self.suite, self.start + timedelta(days=2), nights=5)
+        stats = occupancy([self.property.pk], self.start, self.end)
+        self.assertEqual([day['sold'] for day in stats['days']], [1, 0, 1, 1])
+        self.assertEqual((stats['sold'], stats['available']), (3, 16))
+        self.assertEqual(stats['rate'], 3 / 16 * 100)
+
+    def test_only_sold_nights_count(self):
+        make_booking(self.user, self.double, self.start, status='pending')
+        make_booking(self.user, self.double, self.start, status='cancelled')
+        self.assertEqual(occupancy([self.property.pk], self.start, self.end)['sold'], 0)
+
+    def test_query_count_is_fixed(self):
+        for day in range(4):
+            make_booking(self.user, self.double, self.start + timedelta(days=day))
+        with self.assertNumQueries(2):
+            occupancy(Property.objects.filter(owner=self.user), self.start, self.start + timedelta(days=365))
+
+
+class BookingRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        self.property = make_property(self.user)
+        self.room = make_room(self.property, total_rooms=5)
+        self.check_in = timezone.now().date() + timedelta(days=3)
+        self.today = timezone.now().date()
+        self.last_week = self.today - timedelta(days=7)
+
+        old = make_booking(self.user, self.room, self.check_in, nights=2)
+        Booking.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=7), updated_at=timezone.now() - timedelta(days=7)
+        )
+        self.booking = make_booking(self.user, self.room, self.check_in, nights=3)
+        make_booking(self.user, self.room, self.check_in, status='pending')
+
+    def rollup(self, *args):
+        call_command('rollup_bookings', *args, stdout=StringIO())
+        return {
+            rollup.date: (rollup.bookings, rollup.pending, rollup.confirmed, rollup.cancellations, rollup.room_nights)
+            for rollup in DailyBookingRollup.objects.filter(property=self.property)
+        }
+
+    def test_first_run_builds_every_day(self):
+        self.assertEqual(self.rollup(), {
+            self.last_week: (1, 0, 1, 0, 2),
+            self.today: (2, 1, 1, 0, 3),
+        })
+        self.assertEqual(DailyBookingRollup.objects.get(date=self.today).revenue, 300)
+
+    def test_incremental_run_only_rebuilds_changed_days(self):
+        self.rollup()
+        # A stale figure on an untouched day must survive the next run
+        DailyBookingRollup.objects.filter(date=self.last_week).update(bookings=99)
+        self.booking.status = 'cancelled'
+        self.booking.save()
+        self.assertEqual(self.rollup(), {
+            self.last_week: (99, 0, 1, 0, 2),
+            self.today: (2, 1, 0, 1, 0),
+        })
+        self.assertEqual(self.rollup('--full')[self.last_week], (1, 0, 1, 0, 2))
+
+    def test_moving_a_booking_updates_both_properties(self):
+        self.rollup()
+        # Only the moved booking has changed since the last run
+        Booking.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        other_room = make_room(make_property(self.user, name='Hilltop Inn'), total_rooms=5)
+        self.booking.room = other_room
+        self.booking.save()
+        self.assertEqual(self.rollup()[self.today], (1, 1, 0, 0, 0))
+        moved = DailyBookingRollup.objects.get(property=other_room.property, date=self.today)
+        self.assertEqual((moved.bookings, moved.confirmed, moved.room_nights), (1, 1, 3))
+
+
+real_send = mail.EmailMessage.send
+
+
+def bounce_send(message, *args, **kwargs):
+    if message.to == ['bounce@example.com']:
+        raise ConnectionError('Mailbox unavailable')
+    return real_send(message, *args, **kwargs)
+
+
+class BookingReminderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        self.room = make_room(make_property(self.user, name="Kate's Lodge"), total_rooms=20)
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+
+    def test_sends_due_reminders_once(self):
+        due = [make_booking(self.user, self.room, self.tomorrow, guest_email=f'g{i}@example.com') for i in range(5)]
+        make_booking(self.user, self.room, self.tomorrow + timedelta(days=5))
+        make_booking(self.user, self.room, self.tomorrow, status='cancelled')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(send_booking_reminders(), (5, 0))
+        # A SELECT and UPDATE claiming the batch, then one UPDATE marking it sent
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 3)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [b.guest_email for b in due])
+        self.assertIn("Kate's Lodge", mail.outbox[0].subject)
+        self.assertEqual(send_booking_reminders(), (0, 0))
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_resumes_across_batches(self):
+        for _ in range(5):
+            make_booking(self.user, self.room, self.tomorrow)
+        self.assertEqual(send_booking_reminders(batch_size=2), (5, 0))
+        self.assertFalse(Booking.objects.filter(reminder_sent_at__isnull=True).exists())
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.FailingBackend')
+    def test_failed_reminders_stay_due(self):
+        booking = make_booking(self.user, self.room, self.tomorrow)
+        self.assertEqual(send_booking_reminders(), (0, 1))
+        booking.refresh_from_db()
+        self.assertIsNone(booking.reminder_sent_at)
+        self.assertEqual(booking.reminder_attempts, 1)
+        # Backed off, so an immediate rerun leaves it alone
+        self.assertEqual(send_booking_reminders(), (0, 0))
+        Booking.objects.filter(pk=booking.pk).update(reminder_next_attempt_at=timezone.now())
+        self.assertEqual(send_booking_reminders(), (0, 1))
+
+    def test_failures_dont_hold_back_later_reminders(self):
+        for _ in range(2):
+            make_booking(self.user, self.room, self.tomorrow, guest_email='bounce@example.com')
+        later = make_booking(self.user, self.room, self.tomorrow)
+        with patch.object(mail.EmailMessage, 'send', autospec=True, side_effect=bounce_send):
+            self.assertEqual(send_booking_reminders(batch_size=2), (1, 2))
+        later.refresh_from_db()
+        self.assertIsNotNone(later.reminder_sent_at)
+
+    def test_gives_up_after_max_attempts(self):
+        booking = make_booking(self.user, self.room, self.tomorrow)
+        Booking.objects.filter(pk=booking.pk).update(reminder_attempts=MAX_ATTEMPTS)
+        self.assertEqual(send_booking_reminders(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+
+class BookingListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='guest', email='guest@example.com', password='pw', is_active=True
+        )
+        self.room = make_room(make_property(self.user), total_rooms=20)
+        self.check_in = timezone.now().date() + timedelta(days=1)
+
+    @patch.object(BookingListView, 'paginate_by', 2)
+    def test_pages_through_bookings_in_check_in_order(self):
+        bookings = [make_booking(self.user, self.room, self.check_in + timedelta(days=i // 2)) for i in range(5)]
+        self.client.force_login(self.user)
+        seen = []
+        params = {}
+        while True:
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse('bookings:booking_list'), params)
+            seen += response.context['bookings']
+            if not response.context['page_obj'].has_next():
+                break
+            params = {'cursor': response.context['page_obj'].next_cursor}
+        self.assertEqual(seen, bookings)
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    """Many guests racing for the last units of a room type."""
+
+    attempts = 20
+    units = 5
+
+    def test_parallel_reservations_never_overbook(self):
+        user = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        room = make_room(make_property(user), total_rooms=self.units)
+        check_in = timezone.now().date() + timedelta(days=3)
+        barrier = threading.Barrier(self.attempts)
+        outcomes = []
+
+        def attempt(index):
+            try:
+                booking = Booking(
+                    user=user, room=room, check_in_date=check_in,
+                    check_out_date=check_in + timedelta(days=1 + index % 3), guests=1,
+                    guest_name=f'Guest {index}', guest_email='guest@example.com', guest_phone='1'
+                )
+                barrier.wait()
+                reserve_booking(booking)
+                outcomes.append('booked')
+            except RoomUnavailable:
+                outcomes.append('sold out')
+            except Exception as e:
+                outcomes.append(repr(e))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=attempt, args=(i,)) for i in range(self.attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(set(outcomes)), ['booked', 'sold out'])
+        self.assertEqual(outcomes.count('booked'), self.units)
+        self.assertEqual(Booking.objects.count(), self.units)
+        self.assertFalse(RoomNight.objects.filter(unit__gte=self.units).exists())
@@ -4,9 +4,14 @@ from django.contrib import messages
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils.decorators import method_decorator
-from django.db.models import Q
-from properties.models import Room
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+from properties.caching import property_tag
+from properties.models import PropertyImage, Room
+from pano.caching import cache_for_anonymous
+from pano.pagination import KeysetPaginationMixin
 from .models import Booking, Payment
+from .availability import RoomUnavailable, find_available_room, free_units, hold_expiry, reserve_booking
 from .forms import BookingForm, PaymentForm
 from datetime import datetime, timedelta
 from django.utils import timezone
@@ -32,18 +37,6 @@ def create_booking(request):
             check_in = datetime.strptime(check_in_str, '%Y-%m-%d').date()
             check_out = datetime.strptime(check_out_str, '%Y-%m-%d').date()
             
-            # Check availability
-            conflicting_bookings = Booking.objects.filter(
-                room=room,
-                status__in=['confirmed', 'pending'],
-                check_in_date__lt=check_out,
-                check_out_date__gt=check_in
-            )
-            
-            if conflicting_bookings.exists():
-                messages.error(request, 'Room is no longer available for the selected dates.')
-                return redirect('properties:property_detail', pk=property_id)
-            
             # Create booking
             booking = Booking(
                 user=request.user,
@@ -55,15 +48,20 @@ def create_booking(request):
                 guest_email=request.POST.get('guest_email', ''),
                 guest_phone=request.POST.get('guest_phone', ''),
                 special_requests=request.POST.get('special_requests', ''),
-                status='pending'
+                status='pending',
+                hold_expires_at=hold_expiry()
             )
             
             # Calculate totals (this will be done again in save() but we need it for redirect)
             booking.total_nights = (check_out - check_in).days
             booking.total_amount = room.price_per_night * booking.total_nights
             
-            # Save booking
-            booking.save()
+            # Save booking and claim its room-nights in one locked transaction
+            try:
+                reserve_booking(booking)
+            except RoomUnavailable:
+                messages.error(request, 'Room is no longer available for the selected dates.')
+                return redirect('properties:property_detail', pk=property_id)
             
             # Redirect to payment page
             return redirect('bookings:payment', booking_id=booking.id)
@@ -85,31 +83,15 @@ def create_booking(request):
             return redirect('properties:property_detail', pk=property_id)
         
         try:
-            # Find the first available room of the selected type
-            room = Room.objects.filter(
-                property_id=property_id,
-                room_type=room_type,
-                is_available=True
-            ).first()
-            
-            if not room:
-                messages.error(request, 'No rooms available of the selected type.')
-                return redirect('properties:property_detail', pk=property_id)
-            
             # Parse dates
             check_in = datetime.strptime(check_in_str, '%Y-%m-%d').date()
             check_out = datetime.strptime(check_out_str, '%Y-%m-%d').date()
             
-            # Check availability
-            conflicting_bookings = Booking.objects.filter(
-                room=room,
-                status__in=['confirmed', 'pending'],
-                check_in_date__lt=check_out,
-                check_out_date__gt=check_in
-            )
+            # Find the cheapest room of the selected type with a free unit
+            room = find_available_room(property_id, room_type, check_in, check_out)
             
-            if conflicting_bookings.exists():
-                messages.error(request, 'Room is no longer available for the selected dates.')
+            if not room:
+                messages.error(request, 'No rooms available of the selected type for the selected dates.')
                 return redirect('properties:property_detail', pk=property_id)
             
             # Pre-fill form with available data
@@ -151,27 +133,39 @@ def payment(request, booking_id):
         messages.error(request, 'This booking cannot be paid for.')
         return redirect('bookings:booking_detail', pk=booking_id)
     
+    if booking.hold_expired:
+        messages.error(request, 'Your reservation hold has expired. Please check availability and book again.')
+        return redirect('properties:property_detail', pk=booking.room.property_id)
+    
     if request.method == 'POST':
         payment_method = request.POST.get('payment_method', 'credit_card')
         
         # Always succeed for demo purposes
         try:
-            # Update booking status
-            booking.status = 'confirmed'
-            booking.save()
-            
-            # Create payment record
-            import random
-            from django.utils import timezone
-            
-            Payment.objects.create(
-                booking=booking,
-                payment_method=payment_method,
-                amount=booking.total_amount,
-                status='completed',
-                transaction_id=f"TXN{random.randint(100000, 999999)}",
-                payment_date=timezone.now()
-            )
+            with transaction.atomic():
+                # Lock the booking so the hold sweeper can't expire it mid-payment
+                booking = Booking.objects.select_for_update().get(pk=booking.pk)
+                if booking.status != 'pending' or booking.hold_expired:
+                    messages.error(request, 'This booking cannot be paid for.')
+                    return redirect('bookings:booking_detail', pk=booking_id)
+                
+                # Update booking status and turn the hold into a booking
+                booking.status = 'confirmed'
+                booking.hold_expires_at = None
+                booking.save()
+                
+                # Create payment record
+                import random
+                from django.utils import timezone
+                
+                Payment.objects.create(
+                    booking=booking,
+                    payment_method=payment_method,
+                    amount=booking.total_amount,
+                    status='completed',
+                    transaction_id=f"TXN{random.randint(100000, 999999)}",
+                    payment_date=timezone.now()
+                )
             
             messages.success(request, 'Payment successful! Your booking is confirmed.')
             return redirect('bookings:booking_detail', pk=booking_id)
@@ -190,13 +184,23 @@ def booking_detail(request, pk):
     return render(request, 'bookings/booking_detail.html', {'booking': booking})
 
 @method_decorator(login_required, name='dispatch')
-class BookingListView(LoginRequiredMixin, ListView):
+class BookingListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Booking
     template_name = 'bookings/booking_list.html'
     context_object_name = 'bookings'
+    paginate_by = 20
     
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user).order_by('check_in_date')
+        first_image = PropertyImage.objects.filter(property=OuterRef('property')).order_by('pk').values('pk')[:1]
+        return Booking.objects.filter(user=self.request.user).select_related(
+            'room__property'
+        ).prefetch_related(
+            Prefetch(
+                'room__property__images',
+                queryset=PropertyImage.objects.filter(pk=Subquery(first_image)),
+                to_attr='thumbnails',
+            )
+        ).order_by('check_in_date', 'pk')
 
 @login_required
 def cancel_booking(request, pk):
@@ -236,8 +240,11 @@ def confirm_booking(request, pk):
         messages.error(request, 'Access denied.')
         return redirect('home')
     
-    if booking.status == 'pending':
+    if booking.hold_expired:
+        messages.error(request, 'This booking hold has expired.')
+    elif booking.status == 'pending':
         booking.status = 'confirmed'
+        booking.hold_expires_at = None
         booking.save()
         messages.success(request, 'Booking confirmed successfully!')
     
@@ -252,14 +259,7 @@ def room_availability(request, room_id):
         check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
         check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
         
-        conflicting_bookings = Booking.objects.filter(
-            room=room,
-            status__in=['confirmed', 'pending'],
-            check_in_date__lt=check_out_date,
-            check_out_date__gt=check_in_date
-        )
-        
-        is_available = not conflicting_bookings.exists()
+        is_available = free_units(room, check_in_date, check_out_date) > 0
         
         return render(request, 'bookings/availability_check.html', {
             'room': room,
@@ -279,6 +279,8 @@ from datetime import datetime
 
 # bookings/views.py
 # bookings/views.py - Update check_availability view
+# Short-lived, since a hold lapsing frees a room without any save
+@cache_for_anonymous(lambda request: [property_tag(request.GET.get('property_id'), 'availability')], timeout=60)
 def check_availability(request):
     room_type = request.GET.get('room_type')
     check_in = request.GET.get('check_in')
@@ -292,31 +294,18 @@ def check_availability(request):
         check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
         check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
         
-        # Find available rooms of the selected type
-        available_rooms = Room.objects.filter(
-            property_id=property_id,
-            room_type=room_type,
-            is_available=True
-        )
+        # One query over the room-night ledger instead of a scan per room
+        room = find_available_room(property_id, room_type, check_in_date, check_out_date)
         
-        # Check for conflicting bookings
-        for room in available_rooms:
-            conflicting_bookings = Booking.objects.filter(
-                room=room,
-                status__in=['confirmed', 'pending'],
-                check_in_date__lt=check_out_date,
-                check_out_date__gt=check_in_date
-            )
-            
-            if not conflicting_bookings.exists():
-                # Room is available
-                total_nights = (check_out_date - check_in_date).days
-                return JsonResponse({
-                    'available': True,
-                    'room_id': room.id,  # Add room_id to response
-                    'price': float(room.price_per_night),
-                    'total_nights': total_nights
-                })
+        if room:
+            total_nights = (check_out_date - check_in_date).days
+            return JsonResponse({
+                'available': True,
+                'room_id': room.id,  # Add room_id to response
+                'price': float(room.price_per_night),
+                'total_nights': total_nights,
+                'units_available': room.free_units
+            })
         
         return JsonResponse({'available': False})
         
@@ -0,0 +1,112 @@
+"""Response caching with tag-based invalidation.
+
+Every cached entry is keyed on the current version of each tag it depends
+on, e.g. ``property:7:reviews``. Invalidating a tag gives it a new version,
+so exactly the entries that were built against the old one stop being
+found and age out of the cache on their own.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+TAG_PREFIX = 'cachetag:'
+
+
+def get_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def tag_versions(tags):
+    """Return the current version of each tag, in order, from one cache read."""
+    cache = get_cache()
+    keys = [TAG_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    # A tag that was never set, or was evicted, starts at a fresh version so
+    # it can't match anything cached before it went missing
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*tags):
+    get_cache().set_many({TAG_PREFIX + tag: uuid.uuid4().hex for tag in tags}, None)
+
+
+def make_key(prefix, base, tags):
+    versions = tag_versions(tags)
+    parts = [base] + [f'{tag}={version}' for tag, version in zip(tags, versions)]
+    return f'{prefix}:' + hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def is_cacheable(request):
+    # Flash messages and anything tied to a signed-in user must never be
+    # served to someone else
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and 'messages' not in request.COOKIES
+    )
+
+
+def store_response(request, key, response, timeout):
+    def store(response):
+        if response.status_code == 200 and not response.cookies and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            get_cache().set(key, response, timeout)
+        return response
+
+    if getattr(response, 'is_rendered', True):
+        store(response)
+    else:
+        response.add_post_render_callback(store)
+    return response
+
+
+def cached_response(request, tags, timeout, view):
+    if not is_cacheable(request):
+        return view()
+    key = make_key('page', request.build_absolute_uri(), tags)
+    response = get_cache().get(key)
+    if response is None:
+        response = store_response(request, key, view(), timeout)
+    return response
+
+
+class CacheForAnonymousMixin:
+    """Serve anonymous GETs from the cache until one of ``get_cache_tags()`` changes."""
+
+    cache_timeout = None
+
+    def get_cache_tags(self):
+        return []
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+
+    def dispatch(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.get_cache_tags(), self.get_cache_timeout(),
+            lambda: super(CacheForAnonymousMixin, self).dispatch(request, *args, **kwargs)
+        )
+
+
+def cache_for_anonymous(get_tags, timeout):
+    """The function-view counterpart of ``CacheForAnonymousMixin``.
+
+    ``get_tags`` is called with the view's arguments and returns its tags.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return cached_response(
+                request, get_tags(request, *args, **kwargs), timeout,
+                lambda: view_func(request, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,50 @@
+"""In-process caching for small, rarely-changing reference data.
+
+A lookup such as the list of cities with listed properties is loaded once
+per worker process and kept in memory. Each call compares the versions of
+the lookup's cache tags (see caching.py) against those it was loaded
+under, so invalidating a tag from any process makes every worker reload
+on its next call. A hit costs one shared cache read and no query.
+
+The versions live in the PAGE_CACHE_ALIAS cache, so that alias must be
+shared between processes, as the default 'shared' file cache is.
+"""
+from functools import update_wrapper
+
+from .caching import invalidate_tags, tag_versions
+
+LOOKUP_TAG_PREFIX = 'lookup:'
+
+
+class CachedLookup:
+    def __init__(self, loader, tags):
+        self.loader = loader
+        self.tag = f'{LOOKUP_TAG_PREFIX}{loader.__module__}.{loader.__qualname__}'
+        self.tags = [self.tag, *tags]
+        # Version and value as one tuple, so threads never see them torn
+        self.loaded = (None, None)
+        update_wrapper(self, loader)
+
+    def __call__(self):
+        versions = tag_versions(self.tags)
+        loaded_versions, value = self.loaded
+        if versions != loaded_versions:
+            # Versions are read before loading, so an invalidation that lands
+            # mid-load is picked up by the next call
+            value = self.loader()
+            self.loaded = (versions, value)
+        return value
+
+    def invalidate(self):
+        """Make every process reload the lookup on its next call."""
+        invalidate_tags(self.tag)
+
+
+def cached_lookup(*tags):
+    """Cache the decorated no-argument loader in process until one of ``tags`` changes.
+
+    The lookup also has a tag of its own, which ``.invalidate()`` bumps.
+    """
+    def decorator(loader):
+        return CachedLookup(loader, tags)
+    return decorator
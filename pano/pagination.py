@@ -0,0 +1,186 @@
+"""Keyset (cursor) pagination for list views.
+
+Instead of an OFFSET, each page asks for the rows after (or before) the
+sort key of the last row seen, so page 500 costs what page 1 does and no
+``COUNT(*)`` is needed. The key is a list of ``(field, descending)`` pairs
+ending in a unique field, read from the queryset's ordering by default
+with ``pk`` added as the tie-breaker. NULLs sort last, matching the
+``nulls_last=True`` orderings the views already use. Cursors handed to the
+client are signed, so they can't be edited into arbitrary filters.
+"""
+import datetime
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, OrderBy, Q
+
+CURSOR_SALT = 'pano.pagination.cursor'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPage:
+    """A page of results with cursors for its neighbours, in the spirit of ``Page``."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def ordering_key(queryset):
+    """The ``(field, descending)`` key for ``queryset``'s ordering, ending in ``pk``."""
+    key = []
+    for item in queryset.query.order_by or queryset.model._meta.ordering:
+        if isinstance(item, OrderBy) and isinstance(item.expression, F):
+            key.append((item.expression.name, item.descending))
+        elif isinstance(item, str) and item.lstrip('-') != '?':
+            key.append((item.lstrip('-'), item.startswith('-')))
+        else:
+            raise ValueError(f'Cannot paginate by cursor on {item!r}')
+    names = {name for name, _ in key}
+    if not names & {'pk', 'id'}:
+        key.append(('pk', key[-1][1] if key else True))
+    return key
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, per_page, key=None):
+        self.queryset = queryset
+        self.key = key or ordering_key(queryset)
+        self.per_page = per_page
+
+    def encode_cursor(self, obj, forward):
+        values = [getattr(obj, name) for name, _ in self.key]
+        return signing.dumps(
+            {'f': forward, 'v': values}, salt=CURSOR_SALT, serializer=CursorSerializer, compress=True
+        )
+
+    def decode_cursor(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT, serializer=CursorSerializer)
+            values = data['v']
+            if len(values) != len(self.key):
+                raise ValueError
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise InvalidCursor('Invalid page cursor')
+        return data['f'], [self.to_python(name, value) for (name, _), value in zip(self.key, values)]
+
+    def to_python(self, name, value):
+        if value is None:
+            return None
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # An annotation, such as a search rank
+            return value
+        return field.to_python(value)
+
+    def is_nullable(self, name):
+        try:
+            return self.queryset.model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            return True
+
+    def ordering(self, forward):
+        if forward:
+            return [F(name).desc(nulls_last=True) if desc else F(name).asc(nulls_last=True) for name, desc in self.key]
+        return [F(name).asc(nulls_first=True) if desc else F(name).desc(nulls_first=True) for name, desc in self.key]
+
+    def beyond(self, name, desc, value, forward):
+        """Rows past ``value`` in one column, in the direction of travel."""
+        if value is None:
+            # NULLs come last, so nothing follows them and everything else precedes them
+            return None if forward else Q(**{f'{name}__isnull': False})
+        condition = Q(**{f'{name}__{"lt" if desc == forward else "gt"}': value})
+        if forward and self.is_nullable(name):
+            condition |= Q(**{f'{name}__isnull': True})
+        return condition
+
+    def seek(self, values, forward):
+        """Rows strictly after (or before) ``values`` in key order."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, desc), value in zip(self.key, values):
+            step = self.beyond(name, desc, value, forward)
+            if step is not None:
+                condition |= equal & step
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+        return condition
+
+    def page(self, cursor=None):
+        forward, values = self.decode_cursor(cursor) if cursor else (True, None)
+        queryset = self.queryset.order_by(*self.ordering(forward))
+        if values is not None:
+            queryset = queryset.filter(self.seek(values, forward))
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        # Travelling forwards there is a previous page whenever we came from
+        # a cursor, and backwards there is always a next page
+        has_next = more if forward else True
+        has_previous = values is not None if forward else more
+        return CursorPage(
+            rows,
+            self.encode_cursor(rows[-1], True) if rows and has_next else None,
+            self.encode_cursor(rows[0], False) if rows and has_previous else None,
+        )
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder rounds to milliseconds, which would skip or
+        # repeat rows whose timestamps differ by less
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer:
+    def dumps(self, obj):
+        return CursorEncoder(separators=(',', ':')).encode(obj).encode('latin-1')
+
+    def loads(self, data):
+        return signing.JSONSerializer().loads(data)
+
+
+class KeysetPaginationMixin:
+    """Cursor pagination for a ``ListView``, in place of ``paginate_by`` pages.
+
+    Pages follow the queryset's ordering unless ``keyset`` says otherwise.
+    The cursor arrives in the ``cursor`` query parameter; templates get
+    ``page_obj.next_cursor`` and ``page_obj.previous_cursor``.
+    """
+
+    keyset = None
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, self.keyset)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            # A stale or mangled link falls back to the first page
+            page = paginator.page()
+        return (paginator, page, page.object_list, page.has_other_pages())
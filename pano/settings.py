@@ -103,10 +103,49 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent
+            # reservations wait for each other instead of failing to upgrade
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # An on-disk test database, unlike the shared-cache in-memory one,
+        # lets concurrency tests wait on locks the way production does
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory is private to each process, so cached pages and the tag
+# versions that fragments and lookups are keyed on (see pano/caching.py)
+# live in 'shared', where an invalidation reaches every worker. Swap that for a Redis cache, e.g.
+# 'django.core.cache.backends.redis.RedisCache' at 'redis://127.0.0.1:6379/1',
+# when the workers don't share a disk.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pano',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    },
+}
+
+# Anonymous pages and cache tag versions
+PAGE_CACHE_ALIAS = 'shared'
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+
+# Gives each test run its own 'shared' cache directory
+TEST_RUNNER = 'pano.test_runner.TemporaryCacheRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -162,6 +201,8 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 """
 # Email configuration
+# Views queue mail in the outbox; `manage.py send_queued_emails --loop`
+# delivers it through this backend
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
 # For production, use SMTP:
 """EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -217,5 +258,14 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Chunks of resumable video uploads wait here until the upload is assembled
+VIDEO_UPLOAD_CHUNK_DIR = BASE_DIR / 'upload_chunks'
+VIDEO_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Bookings
+# How long a pending booking holds its room while the guest pays
+BOOKING_HOLD_MINUTES = 15
+# Check-in reminders go out this many days ahead (see send_booking_reminders)
+BOOKING_REMINDER_DAYS = 1
@@ -0,0 +1,28 @@
+"""Test runner that keeps the shared file cache out of the project directory."""
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TemporaryCacheRunner(DiscoverRunner):
+    """Point the 'shared' cache at a fresh directory for each run.
+
+    Cache tag versions outlive the process, so reusing the project's cache
+    directory would let one run find pages and lookups stored by another.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='pano-cache-')
+        caches = {alias: dict(config) for alias, config in settings.CACHES.items()}
+        caches['shared']['LOCATION'] = self.cache_dir
+        self.cache_override = override_settings(CACHES=caches)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Property, PropertyImage, Room, RoomImage, Review, PropertyVideo
+from django.utils import timezone
+from .models import MediaBlob, MediaJob, Property, PropertyImage, Room, RoomImage, Review, PropertyVideo
 
 class PropertyImageInline(admin.TabularInline):
     model = PropertyImage
@@ -36,3 +37,22 @@ class ReviewAdmin(admin.ModelAdmin):
 
 
 admin.site.register(PropertyVideo)
+
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'model', 'object_id', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['model', 'last_error']
+    readonly_fields = ['task', 'model', 'object_id', 'attempts', 'last_error', 'created_at', 'started_at', 'finished_at']
+    actions = ['retry_jobs']
+    
+    @admin.action(description='Retry selected jobs')
+    def retry_jobs(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', run_after=timezone.now(), attempts=0)
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'refcount', 'created_at', 'orphaned_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'size', 'refcount', 'created_at', 'orphaned_at']
@@ -0,0 +1,108 @@
+"""Reference counting and garbage collection for content-addressed media.
+
+Signals keep ``MediaBlob.refcount`` in step with the file fields that use
+``ContentAddressedStorage``. Code that changes those fields with a queryset
+``update()`` must call ``swap_reference`` itself.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Case, F, FileField, Value, When
+from django.utils import timezone
+
+from .images import derivative_names
+from .models import MediaBlob
+from .storage import ContentAddressedStorage, content_addressed_storage
+
+# Long enough for an upload to be saved onto its row after the file lands
+GRACE_PERIOD = timedelta(hours=24)
+
+
+def content_addressed_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def stored_names(instance):
+    """Map each content-addressed field of ``instance`` to its stored name.
+
+    Deferred fields map to None, since their name isn't known.
+    """
+    names = {}
+    for field in content_addressed_fields(type(instance)):
+        if field.attname not in instance.__dict__:
+            names[field.attname] = None
+        else:
+            value = instance.__dict__[field.attname]
+            names[field.attname] = getattr(value, 'name', value) or ''
+    return names
+
+
+def retain(name):
+    if name:
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1, orphaned_at=None)
+
+
+def release(name):
+    if name:
+        MediaBlob.objects.filter(name=name).update(
+            refcount=F('refcount') - 1,
+            orphaned_at=Case(When(refcount__lte=1, then=Value(timezone.now())), default=F('orphaned_at'))
+        )
+
+
+def swap_reference(old, new):
+    if old != new:
+        retain(new)
+        release(old)
+
+
+def recount_references():
+    """Recompute every refcount from the rows, returning how many were wrong.
+
+    Repairs drift from changes that bypassed the signals, such as raw SQL.
+    """
+    counts = Counter()
+    for model in apps.get_models():
+        attnames = [field.attname for field in content_addressed_fields(model)]
+        if attnames:
+            for names in model.objects.values_list(*attnames).iterator():
+                counts.update(name for name in names if name)
+
+    now = timezone.now()
+    fixed = []
+    for blob in MediaBlob.objects.iterator():
+        refcount = counts.get(blob.name, 0)
+        if refcount != blob.refcount:
+            blob.refcount = refcount
+            blob.orphaned_at = None if refcount else (blob.orphaned_at or now)
+            fixed.append(blob)
+    MediaBlob.objects.bulk_update(fixed, ['refcount', 'orphaned_at'], batch_size=500)
+    return len(fixed)
+
+
+def collect_garbage(grace=GRACE_PERIOD):
+    """Delete blobs unreferenced for longer than ``grace``, with their derivatives.
+
+    Returns the number of blobs deleted and the bytes they freed.
+    """
+    cutoff = timezone.now() - grace
+    storage = content_addressed_storage
+    collected = freed = 0
+    for blob in list(MediaBlob.objects.filter(refcount__lte=0, orphaned_at__lt=cutoff)):
+        # The conditions are checked again as the row goes, in case an
+        # upload picked the blob up since the query ran
+        with transaction.atomic():
+            deleted, _ = MediaBlob.objects.filter(pk=blob.pk, refcount__lte=0, orphaned_at__lt=cutoff).delete()
+            if not deleted:
+                continue
+            storage.delete(blob.name)
+            for name in derivative_names(blob.name):
+                storage.delete(name)
+        collected += 1
+        freed += blob.size
+    return collected, freed
@@ -0,0 +1,21 @@
+"""Cache tags for property pages and the models that invalidate them."""
+from pano.caching import invalidate_tags
+
+PROPERTY_LIST_TAG = 'property-list'
+
+
+def property_tag(property_id, part=None):
+    tag = f'property:{property_id}'
+    return f'{tag}:{part}' if part else tag
+
+
+def property_page_tags(property_id):
+    """Everything the detail page renders about one property."""
+    return [property_tag(property_id, part) for part in (None, 'rooms', 'reviews', 'media')]
+
+
+def invalidate_property(property_id, part=None, listed=True):
+    tags = [property_tag(property_id, part)]
+    if listed:
+        tags.append(PROPERTY_LIST_TAG)
+    invalidate_tags(*tags)
@@ -0,0 +1,153 @@
+"""Amenity, type, price and rating facets for the property list.
+
+A property's own amenities are packed into the ``amenities`` bitmask by
+``Property.save()``, and the amenities of its available rooms into
+``room_amenities`` by the room stats refresh (see stats.py). Filtering on
+any set of amenities is then one bitwise test per column, and the count
+for every facet value comes from a single aggregate query.
+
+Counts follow the usual faceted search rules: amenities narrow each
+other, so their counts include every selected filter, while picking a
+type, price band or rating replaces the previous choice, so each of those
+groups is counted as if its own selection were cleared.
+"""
+from django.db.models import Count, F, Q
+from django.db.models.lookups import Exact
+
+PROPERTY_AMENITIES = [
+    ('wifi', 'WiFi'),
+    ('parking', 'Parking'),
+    ('restaurant', 'Restaurant'),
+    ('gym', 'Gym'),
+    ('pool', 'Pool'),
+    ('spa', 'Spa'),
+    ('pets_allowed', 'Pets allowed'),
+]
+ROOM_AMENITIES = [
+    ('air_conditioning', 'Air conditioning'),
+    ('balcony', 'Balcony'),
+    ('tv', 'TV'),
+    ('mini_bar', 'Mini bar'),
+    ('room_service', 'Room service'),
+]
+# (key, label, lowest, below) on the cheapest available room
+PRICE_BANDS = [
+    ('under-50', 'Under $50', None, 50),
+    ('50-100', '$50 to $100', 50, 100),
+    ('100-200', '$100 to $200', 100, 200),
+    ('200-plus', '$200 and up', 200, None),
+]
+RATING_BANDS = [
+    ('4', '4+ stars', 4),
+    ('3', '3+ stars', 3),
+]
+
+
+def amenity_bit(amenities, name):
+    return 1 << [key for key, _ in amenities].index(name)
+
+
+def amenity_mask(obj, amenities):
+    """The bitmask of the ``amenities`` that ``obj`` has."""
+    return sum(1 << bit for bit, (name, _) in enumerate(amenities) if getattr(obj, name))
+
+
+def has_amenities(column, mask):
+    return Q(Exact(F(column).bitand(mask), mask))
+
+
+def amenity_condition(names):
+    condition = Q()
+    for column, amenities in (('amenities', PROPERTY_AMENITIES), ('room_amenities', ROOM_AMENITIES)):
+        mask = sum(amenity_bit(amenities, name) for name in names if name in dict(amenities))
+        if mask:
+            condition &= has_amenities(column, mask)
+    return condition
+
+
+def type_condition(value):
+    return Q(property_type=value)
+
+
+def price_condition(value):
+    _, _, lowest, below = next(band for band in PRICE_BANDS if band[0] == value)
+    condition = Q(min_price__isnull=False)
+    if lowest is not None:
+        condition &= Q(min_price__gte=lowest)
+    if below is not None:
+        condition &= Q(min_price__lt=below)
+    return condition
+
+
+def rating_condition(value):
+    _, _, lowest = next(band for band in RATING_BANDS if band[0] == value)
+    return Q(avg_rating__gte=lowest)
+
+
+def facet_options(property_types):
+    """Every facet group as ``(name, label, multiple, [(value, label, condition)])``."""
+    return [
+        ('amenity', 'Amenities', True, [
+            (name, label, amenity_condition([name])) for name, label in PROPERTY_AMENITIES + ROOM_AMENITIES
+        ]),
+        ('type', 'Property type', False, [
+            (value, label, type_condition(value)) for value, label in property_types
+        ]),
+        ('price', 'Price per night', False, [
+            (key, label, price_condition(key)) for key, label, _, _ in PRICE_BANDS
+        ]),
+        ('rating', 'Guest rating', False, [
+            (key, label, rating_condition(key)) for key, label, _ in RATING_BANDS
+        ]),
+    ]
+
+
+def selected_facets(params, property_types):
+    """The valid facet values chosen in ``params``, by group."""
+    selected = {}
+    for name, _, multiple, options in facet_options(property_types):
+        values = {value for value, _, _ in options}
+        chosen = [value for value in params.getlist(name) if value in values]
+        if chosen:
+            selected[name] = chosen if multiple else chosen[:1]
+    return selected
+
+
+def facet_filters(selected, property_types):
+    """A condition per selected group; values in a multiple group must all hold."""
+    filters = {}
+    for name, _, multiple, options in facet_options(property_types):
+        if name in selected:
+            conditions = {value: condition for value, _, condition in options}
+            filters[name] = Q(*[conditions[value] for value in selected[name]])
+    return filters
+
+
+def facet_counts(queryset, selected, property_types):
+    """Counts for every facet value over ``queryset``, which no facet has filtered yet."""
+    filters = facet_filters(selected, property_types)
+    groups = facet_options(property_types)
+    aggregates = {}
+    for index, (name, _, multiple, options) in enumerate(groups):
+        # A single-choice group is counted without its own selection
+        others = Q(*[condition for group, condition in filters.items() if multiple or group != name])
+        for position, (_, _, condition) in enumerate(options):
+            aggregates[f'f{index}_{position}'] = Count('pk', filter=condition & others)
+    counts = queryset.order_by().aggregate(**aggregates)
+    return [
+        {
+            'name': name,
+            'label': label,
+            'multiple': multiple,
+            'options': [
+                {
+                    'value': value,
+                    'label': option_label,
+                    'count': counts[f'f{index}_{position}'],
+                    'selected': value in selected.get(name, []),
+                }
+                for position, (value, option_label, _) in enumerate(options)
+            ],
+        }
+        for index, (name, label, multiple, options) in enumerate(groups)
+    ]
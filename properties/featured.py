@@ -0,0 +1,86 @@
+"""The home page's featured-stays block, built once and served from the cache."""
+from django.db.models import F, OuterRef, Prefetch, Subquery
+
+from pano.caching import get_cache
+
+from .models import Property, PropertyImage
+
+FEATURED_STAYS_CACHE_KEY = 'home:featured_stays'
+FEATURED_STAYS_TIMEOUT = 60 * 15
+FEATURED_STAYS_LIMIT = 6
+
+
+def build_featured_stays():
+    """Serialize the featured properties from a fixed number of queries.
+
+    The prefetch selects exactly one cover image per property, the primary
+    one when there is one, so the loop below never goes back to the database.
+    """
+    cover = PropertyImage.objects.filter(
+        property=OuterRef('property')
+    ).order_by('-is_primary', 'pk').values('pk')[:1]
+    
+    featured_properties = Property.objects.filter(
+        is_active=True,
+        is_featured=True
+    ).prefetch_related(
+        Prefetch('images', queryset=PropertyImage.objects.filter(pk=Subquery(cover)), to_attr='cover_images')
+    ).order_by(F('avg_rating').desc(nulls_last=True))[:FEATURED_STAYS_LIMIT]
+    
+    featured_stays = []
+    for prop in featured_properties:
+        cover = prop.cover_images[0] if prop.cover_images else None
+        # Collect amenities
+        amenities = []
+        if prop.wifi:
+            amenities.append('Free WiFi')
+        if prop.parking:
+            amenities.append('Free Parking')
+        if prop.restaurant:
+            amenities.append('Restaurant')
+        # Add other amenities as needed
+        
+        featured_stays.append({
+            'id': prop.id,
+            'title': prop.name,
+            'location': f"{prop.city}, {prop.country}",
+            'type': prop.property_type,
+            'rating': prop.avg_rating or 0,
+            'reviews': prop.review_count,
+            'price': prop.min_price or 0,
+            'image_url': cover.card_url if cover else '',
+            'image_srcset': cover.srcset if cover else '',
+            'image_webp_srcset': cover.webp_srcset if cover else '',
+            'amenities': amenities,
+            'url': prop.get_absolute_url(),
+        })
+    return featured_stays
+
+
+def get_featured_stays():
+    cache = get_cache()
+    featured_stays = cache.get(FEATURED_STAYS_CACHE_KEY)
+    if featured_stays is None:
+        featured_stays = build_featured_stays()
+        cache.set(FEATURED_STAYS_CACHE_KEY, featured_stays, FEATURED_STAYS_TIMEOUT)
+    return featured_stays
+
+
+def invalidate_featured_stays(property_id, is_featured=None):
+    """Drop the cached block if ``property_id`` is, or could now be, part of it.
+
+    A featured property outside the block can move into it when its
+    reviews, rooms or images change, so ``is_featured`` is looked up when
+    the caller doesn't pass it.
+    """
+    cache = get_cache()
+    featured_stays = cache.get(FEATURED_STAYS_CACHE_KEY)
+    if featured_stays is None:
+        return
+    if any(stay['id'] == property_id for stay in featured_stays):
+        cache.delete(FEATURED_STAYS_CACHE_KEY)
+        return
+    if is_featured is None:
+        is_featured = Property.objects.filter(pk=property_id, is_active=True, is_featured=True).exists()
+    if is_featured:
+        cache.delete(FEATURED_STAYS_CACHE_KEY)
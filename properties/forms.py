@@ -1,4 +1,5 @@
 from django import forms
+from .lookups import listed_countries, property_type_descriptions
 from .models import Property, Room, Review
 
 class PropertyForm(forms.ModelForm):
@@ -12,7 +13,17 @@ class PropertyForm(forms.ModelForm):
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
             'address': forms.Textarea(attrs={'rows': 3}),
+            'country': forms.TextInput(attrs={'list': 'country-options'}),
         }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Suggestions and type descriptions come from the in-process lookups
+        self.country_options = listed_countries()
+        descriptions = property_type_descriptions()
+        self.property_type_help = [
+            (label, descriptions[value]) for value, label in Property.PROPERTY_TYPES if descriptions.get(value)
+        ]
 
 class RoomForm(forms.ModelForm):
     class Meta:
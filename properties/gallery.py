@@ -0,0 +1,64 @@
+"""The property detail page's photo and video gallery, served in pages.
+
+The page itself renders only the first item, so its first paint doesn't
+wait on every photo and video; the browser fetches the rest from the
+``property_gallery`` endpoint when the visitor starts browsing. Photos
+come first, primary photo leading, then videos.
+"""
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import PropertyImage, PropertyVideo
+
+GALLERY_PAGE_SIZE = 12
+MAX_GALLERY_PAGE_SIZE = 50
+
+
+def image_item(image):
+    return {
+        'type': 'image',
+        'id': f'image-{image.pk}',
+        'url': image.gallery_url,
+        'thumb': image.card_url,
+        'srcset': image.srcset,
+        'webp_srcset': image.webp_srcset,
+        'caption': image.caption,
+    }
+
+
+def video_item(video):
+    if video.youtube_id:
+        url = f'https://www.youtube.com/embed/{video.youtube_id}'
+    else:
+        url = reverse('properties:stream_video', args=[video.pk])
+    return {
+        'type': 'video',
+        'id': f'video-{video.pk}',
+        'url': url,
+        'youtube': bool(video.youtube_id),
+        'poster': video.poster.url if video.poster else '',
+        'caption': video.caption,
+    }
+
+
+def gallery_page(property_id, offset=0, limit=GALLERY_PAGE_SIZE):
+    """Gallery items ``offset`` to ``offset + limit`` and the total count."""
+    images = PropertyImage.objects.filter(property_id=property_id).order_by('-is_primary', 'pk')
+    # Skip videos with neither a file nor a link we could parse
+    videos = PropertyVideo.objects.filter(
+        Q(video__gt='') | Q(youtube_id__gt=''), property_instance_id=property_id
+    ).order_by('-is_primary', 'pk')
+    image_count = images.count()
+    total = image_count + videos.count()
+
+    items = [image_item(image) for image in images[offset:offset + limit]] if offset < image_count else []
+    if len(items) < limit and offset + len(items) < total:
+        start = max(offset - image_count, 0)
+        items += [video_item(video) for video in videos[start:start + limit - len(items)]]
+
+    following = offset + len(items)
+    return {
+        'items': items,
+        'total': total,
+        'next_offset': following if following < total else None,
+    }
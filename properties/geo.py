@@ -0,0 +1,210 @@
+"""Location search over the properties' latitude and longitude.
+
+Each property stores the geohash of its coordinates, an indexed string
+whose prefixes name ever smaller grid cells. A radius or map-viewport
+query first covers its area with a handful of cells and selects the rows
+whose geohash falls in one of them, which is an index range scan; only
+those candidates are checked exactly, with the haversine distance.
+"""
+import math
+
+from django.db.models import Avg, Count, F, FloatField, Max, Min, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt, Substr
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_RADIUS_KM = 25
+MAX_RADIUS_KM = 500
+# Cells used to cover a search area; more cells fit the area more tightly
+# but cost more index lookups
+MAX_COVER_CELLS = 16
+# Clusters across a map viewport, at most
+MAX_CLUSTER_CELLS = 64
+
+
+def parse_point(lat, lng):
+    lat, lng = float(lat), float(lng)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('Latitude must be within ±90 and longitude within ±180')
+    return lat, lng
+
+
+def parse_radius(radius):
+    radius = float(radius) if radius else DEFAULT_RADIUS_KM
+    if not 0 < radius <= MAX_RADIUS_KM:
+        raise ValueError(f'radius must be between 0 and {MAX_RADIUS_KM} km')
+    return radius
+
+
+def parse_box(bbox):
+    """``(south, west, north, east)`` from a ``south,west,north,east`` string."""
+    try:
+        south, west, north, east = (float(value) for value in bbox.split(','))
+    except ValueError:
+        raise ValueError('bbox must be south,west,north,east')
+    parse_point(south, west)
+    parse_point(north, east)
+    if south > north:
+        raise ValueError('The south edge must not be north of the north edge')
+    return south, west, north, east
+
+
+def cell_size(precision):
+    """The height and width, in degrees, of a geohash cell."""
+    lat_bits = precision * 5 // 2
+    lng_bits = precision * 5 - lat_bits
+    return 180 / 2 ** lat_bits, 360 / 2 ** lng_bits
+
+
+def cell_hash(lat_index, lng_index, precision):
+    """The geohash of the cell at row ``lat_index`` and column ``lng_index``."""
+    lat_bits = precision * 5 // 2
+    lng_bits = precision * 5 - lat_bits
+    bits = 0
+    # Bits alternate between the columns and rows, starting with a column
+    for i in range(precision * 5):
+        if i % 2 == 0:
+            lng_bits -= 1
+            bits = bits << 1 | lng_index >> lng_bits & 1
+        else:
+            lat_bits -= 1
+            bits = bits << 1 | lat_index >> lat_bits & 1
+    return ''.join(BASE32[bits >> shift & 31] for shift in range(precision * 5 - 5, -1, -5))
+
+
+def cell_index(lat, lng, precision):
+    height, width = cell_size(precision)
+    rows, columns = round(180 / height), round(360 / width)
+    return (
+        min(int((lat + 90) / height), rows - 1),
+        min(int((lng + 180) / width), columns - 1),
+    )
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    return cell_hash(*cell_index(float(lat), float(lng), precision), precision)
+
+
+def bounding_box(lat, lng, radius_km):
+    """``(south, west, north, east)`` around a circle, widened to whole longitudes at the poles."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(lat - lat_delta, -90), min(lat + lat_delta, 90)
+    if south == -90 or north == 90:
+        return south, -180, north, 180
+    lng_delta = math.degrees(radius_km / EARTH_RADIUS_KM / math.cos(math.radians(max(abs(south), abs(north)))))
+    if lng_delta >= 180:
+        return south, -180, north, 180
+    return south, wrap_longitude(lng - lng_delta), north, wrap_longitude(lng + lng_delta)
+
+
+def wrap_longitude(lng):
+    return (lng + 180) % 360 - 180
+
+
+def covering_cells(south, west, north, east, max_cells=MAX_COVER_CELLS):
+    """The smallest set of at most ``max_cells`` geohash cells covering the box.
+
+    A box whose west edge is east of its east edge crosses the antimeridian.
+    """
+    return box_cells(south, west, north, east, grid_precision(south, west, north, east, max_cells))
+
+
+def grid_precision(south, west, north, east, max_cells):
+    """The longest geohash whose cells split the box into at most ``max_cells``."""
+    for precision in range(GEOHASH_PRECISION, 1, -1):
+        rows, first_column, span = box_grid(south, west, north, east, precision)
+        if len(rows) * span <= max_cells:
+            return precision
+    return 1
+
+
+def box_grid(south, west, north, east, precision):
+    """The rows, first column and number of columns of the cells covering the box."""
+    first_row, first_column = cell_index(south, west, precision)
+    last_row, last_column = cell_index(north, east, precision)
+    # Modular, so boxes across the antimeridian wrap around to column 0
+    span = (last_column - first_column) % grid_columns(precision) + 1
+    return range(first_row, last_row + 1), first_column, span
+
+
+def grid_columns(precision):
+    return round(360 / cell_size(precision)[1])
+
+
+def box_cells(south, west, north, east, precision):
+    rows, first_column, span = box_grid(south, west, north, east, precision)
+    columns = grid_columns(precision)
+    return [
+        cell_hash(row, (first_column + offset) % columns, precision)
+        for row in rows for offset in range(span)
+    ]
+
+
+def in_cells(cells):
+    # A range rather than startswith, since LIKE can't use the index on SQLite
+    condition = Q()
+    for cell in cells:
+        condition |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+    return condition
+
+
+def in_box(south, west, north, east):
+    lng = Q(longitude__gte=west, longitude__lte=east)
+    if west > east:
+        lng = Q(longitude__gte=west) | Q(longitude__lte=east)
+    return Q(latitude__gte=south, latitude__lte=north) & lng
+
+
+def distance_km(lat, lng):
+    """The haversine distance from ``(lat, lng)`` to each row's coordinates."""
+    lat, lng = math.radians(lat), math.radians(lng)
+    row_lat = Radians(Cast('latitude', FloatField()))
+    row_lng = Radians(Cast('longitude', FloatField()))
+    half_chord = (
+        Power(Sin((row_lat - lat) / 2), 2)
+        + math.cos(lat) * Cos(row_lat) * Power(Sin((row_lng - lng) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(half_chord), output_field=FloatField())
+
+
+def nearby(queryset, lat, lng, radius_km=DEFAULT_RADIUS_KM):
+    """Rows within ``radius_km`` of ``(lat, lng)``, annotated with ``distance`` and nearest first."""
+    box = bounding_box(lat, lng, radius_km)
+    return queryset.filter(in_cells(covering_cells(*box)), in_box(*box)).annotate(
+        distance=distance_km(lat, lng)
+    ).filter(distance__lte=radius_km).order_by('distance', 'pk')
+
+
+def within(queryset, south, west, north, east):
+    return queryset.filter(in_cells(covering_cells(south, west, north, east)), in_box(south, west, north, east))
+
+
+def clusters(queryset, south, west, north, east):
+    """Markers for the rows inside a map viewport, grouped by geohash cell.
+
+    One grouped query returns a marker per cell, at the average position of
+    its properties; a cell holding a single property names it.
+    """
+    precision = grid_precision(south, west, north, east, MAX_CLUSTER_CELLS)
+    rows = within(queryset, south, west, north, east).order_by().values(
+        cell=Substr('geohash', 1, precision)
+    ).annotate(
+        count=Count('pk'),
+        lat=Avg(F('latitude'), output_field=FloatField()),
+        lng=Avg(F('longitude'), output_field=FloatField()),
+        first_pk=Min('pk'),
+        name=Max('name'),
+        min_price=Min('min_price'),
+    ).order_by('cell')
+    return [
+        {
+            'cell': row['cell'],
+            'count': row['count'],
+            'lat': round(row['lat'], 6),
+            'lng': round(row['lng'], 6),
+            'min_price': float(row['min_price']) if row['min_price'] is not None else None,
+            **({'id': row['first_pk'], 'name': row['name']} if row['count'] == 1 else {}),
+        }
+        for row in rows
+    ]
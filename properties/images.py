@@ -0,0 +1,162 @@
+"""Resized and WebP derivatives of uploaded property and room photos.
+
+Each upload gets a copy at every width in DERIVATIVE_WIDTHS (never larger
+than the original), once in a widely supported format and once as WebP.
+The generated paths are recorded on the image row, so templates can build
+``srcset`` attributes without touching the storage backend.
+
+Derivative names follow their source's name. With content-addressed
+storage, rows sharing an original also share its derivatives, which are
+removed when the original is garbage collected rather than with a row.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .storage import ContentAddressedStorage
+
+DERIVATIVE_WIDTHS = {
+    'card': 480,
+    'gallery': 1024,
+    'full': 1920,
+}
+DERIVATIVE_DIR = 'derivatives'
+DERIVATIVE_EXTENSIONS = ('jpg', 'png', 'webp')
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def derivative_name(source_name, name, extension):
+    stem, _ = os.path.splitext(source_name)
+    return f'{DERIVATIVE_DIR}/{stem}-{name}.{extension}'
+
+
+def derivative_names(source_name):
+    """Every name a derivative of ``source_name`` could have been saved under."""
+    for name in DERIVATIVE_WIDTHS:
+        for extension in DERIVATIVE_EXTENSIONS:
+            yield derivative_name(source_name, name, extension)
+
+
+def encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, image_format, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_derivatives(field_file):
+    """Write every derivative of ``field_file``.
+
+    Returns the original's width and height and the derivatives metadata,
+    which maps each derivative name to its width, height and the storage
+    names of its fallback and WebP files. It also records the source name
+    it was built from, so stale derivatives can be spotted after a re-upload.
+    """
+    storage = getattr(field_file.storage, 'derivative_storage', field_file.storage)
+    with field_file.open('rb'), Image.open(field_file) as original:
+        # Phones store rotation in EXIF, which the resized copies would lose
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA', 'P')
+        fallback_format, fallback_extension = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        original_width, original_height = image.size
+        variants = {}
+        for name, width in DERIVATIVE_WIDTHS.items():
+            width = min(width, image.width)
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            files = {}
+            for key, image_format, extension in (
+                ('src', fallback_format, fallback_extension),
+                ('webp', 'WEBP', 'webp'),
+            ):
+                path = derivative_name(field_file.name, name, extension)
+                if storage.exists(path):
+                    storage.delete(path)
+                files[key] = storage.save(path, encode(resized, image_format))
+            variants[name] = {'width': width, 'height': height, **files}
+
+    return original_width, original_height, {'source': field_file.name, 'variants': variants}
+
+
+def rewrite(field_file, image, image_format):
+    """Replace the stored file with ``image``.
+
+    Other storages overwrite the original in place. Content-addressed
+    storage files the new bytes under a new name, set on ``field_file``,
+    and leaves the original to garbage collection, as other rows may share it.
+    """
+    # Multi-picture files from phone cameras are JPEGs with extra frames
+    content = encode(image, 'JPEG' if image_format == 'MPO' else image_format)
+    storage = field_file.storage
+    if hasattr(field_file, '_file'):
+        # Later reads must open the new file, not the cached original
+        field_file.close()
+        del field_file.file
+    if not isinstance(storage, ContentAddressedStorage):
+        storage.delete(field_file.name)
+    field_file.name = storage.save(field_file.name, content)
+
+
+def strip_metadata(field_file):
+    """Drop EXIF data, such as GPS coordinates, from a stored photo.
+
+    The rotation EXIF described is applied to the pixels first. Returns
+    whether the file had anything to remove.
+    """
+    with field_file.open('rb'), Image.open(field_file) as original:
+        if not original.getexif() and 'exif' not in original.info:
+            return False
+        image_format = original.format
+        image = ImageOps.exif_transpose(original)
+        image.info.pop('exif', None)
+        image.load()
+    rewrite(field_file, image, image_format)
+    return True
+
+
+def shrink_image(field_file, max_size):
+    """Fit a stored photo within ``max_size`` pixels square, without its metadata."""
+    with field_file.open('rb'), Image.open(field_file) as original:
+        image_format = original.format
+        if max(original.size) <= max_size and not original.getexif():
+            return False
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        image.info.pop('exif', None)
+        image.load()
+    rewrite(field_file, image, image_format)
+    return True
+
+
+def process_image(instance):
+    """Generate derivatives for a saved image row unless they are current."""
+    if not instance.image or instance.has_derivatives:
+        return False
+    if not instance.image.storage.exists(instance.image.name):
+        return False
+    # Another row with the same content-addressed original already has them
+    shared = type(instance).objects.filter(
+        image=instance.image.name, derivatives__source=instance.image.name
+    ).exclude(pk=instance.pk).values_list('width', 'height', 'derivatives').first()
+    width, height, derivatives = shared or generate_derivatives(instance.image)
+    # A queryset update, so the row's save signals don't fire a second time
+    type(instance).objects.filter(pk=instance.pk).update(width=width, height=height, derivatives=derivatives)
+    instance.width, instance.height, instance.derivatives = width, height, derivatives
+    return True
+
+
+def delete_derivatives(derivatives, storage):
+    for variant in derivatives.get('variants', {}).values():
+        for key in ('src', 'webp'):
+            if variant.get(key):
+                storage.delete(variant[key])
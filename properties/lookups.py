@@ -0,0 +1,36 @@
+"""Reference data for forms and listing filters, cached in each worker process.
+
+Signals invalidate these when a property or property type is saved or
+deleted (see signals.py).
+"""
+from django.db.models import Count
+
+from pano.lookups import cached_lookup
+from .models import Property, PropertyType
+
+# Cities offered as suggestions, busiest first
+LISTED_CITIES_LIMIT = 50
+
+
+@cached_lookup()
+def property_type_descriptions():
+    """Admin-maintained descriptions of the property types, by lowercased name."""
+    return {name.lower(): description for name, description in PropertyType.objects.values_list('name', 'description')}
+
+
+@cached_lookup()
+def listed_cities():
+    """``(city, country, count)`` for the cities with the most active properties."""
+    return [
+        (row['city'], row['country'], row['count'])
+        for row in Property.objects.filter(is_active=True).values('city', 'country').annotate(
+            count=Count('pk')
+        ).order_by('-count', 'city')[:LISTED_CITIES_LIMIT]
+    ]
+
+
+@cached_lookup()
+def listed_countries():
+    return list(
+        Property.objects.filter(is_active=True).order_by('country').values_list('country', flat=True).distinct()
+    )
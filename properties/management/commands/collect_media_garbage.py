@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from properties.blobs import GRACE_PERIOD, collect_garbage, recount_references
+from properties.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = 'Deletes abandoned video uploads and stored media nothing has referenced for a while'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=GRACE_PERIOD.total_seconds() / 3600,
+            help='Keep unreferenced files at least this long'
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Recompute reference counts from the database first'
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_uploads()
+        self.stdout.write(f'Discarded {expired} abandoned video uploads')
+        if options['recount']:
+            fixed = recount_references()
+            self.stdout.write(f'Corrected {fixed} reference counts')
+        collected, freed = collect_garbage(timedelta(hours=options['grace_hours']))
+        self.stdout.write(f'Deleted {collected} unreferenced files, freeing {freed} bytes')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from properties.images import process_image
+from properties.models import PropertyImage, RoomImage
+
+
+class Command(BaseCommand):
+    help = 'Builds resized and WebP derivatives for images that are missing them'
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for model in (PropertyImage, RoomImage):
+            for image in model.objects.order_by('pk').iterator():
+                try:
+                    built += process_image(image)
+                except OSError as e:
+                    failed += 1
+                    self.stderr.write(f'{image.image.name}: {e}')
+        self.stdout.write(f'Built derivatives for {built} images, {failed} failed')
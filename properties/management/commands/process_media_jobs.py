@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from properties.media_jobs import run_media_jobs, start_pool
+
+
+class Command(BaseCommand):
+    help = 'Runs queued upload processing jobs on a bounded pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Worker processes; 0 runs jobs in this process'
+        )
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for jobs instead of exiting once the queue is empty'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait between polls of an empty queue'
+        )
+
+    def handle(self, *args, **options):
+        pool = start_pool(options['workers']) if options['workers'] else None
+        total = 0
+        try:
+            while True:
+                ran = run_media_jobs(options['batch_size'], pool)
+                total += ran
+                if ran < options['batch_size']:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(f'Ran {total} media jobs')
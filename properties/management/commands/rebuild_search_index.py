@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from properties.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the property full-text search index from scratch'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(f'Rebuilt search index with {type(backend).__name__}')
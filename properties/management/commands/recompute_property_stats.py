@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from properties.models import Property
+from properties.stats import refresh_property_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the rating, review count, price and room summary columns on properties'
+
+    def add_arguments(self, parser):
+        parser.add_argument('property_ids', nargs='*', type=int, help='Only repair these properties')
+
+    def handle(self, *args, **options):
+        properties = Property.objects.all()
+        if options['property_ids']:
+            properties = properties.filter(pk__in=options['property_ids'])
+        updated = refresh_property_stats(properties)
+        self.stdout.write(f'Recomputed stats for {updated} properties')
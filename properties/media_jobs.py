@@ -0,0 +1,197 @@
+"""Upload processing that runs in the ``process_media_jobs`` worker pool.
+
+Saving an upload only queues a ``MediaJob`` row. The worker claims due
+jobs in batches and runs them across a bounded pool of processes, so
+resizing photos or probing videos never holds up a web worker.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.apps import apps
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .blobs import swap_reference
+from .caching import invalidate_property
+from .featured import invalidate_featured_stays
+from .images import process_image, shrink_image, strip_metadata
+from .models import MediaJob, PropertyImage
+
+MAX_ATTEMPTS = 3
+# A running job whose worker has been silent this long is assumed dead
+STALLED_AFTER = timedelta(minutes=15)
+POSTER_OFFSET_SECONDS = 1
+AVATAR_MAX_SIZE = 512
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job can't help."""
+
+
+def enqueue_media_job(task, instance):
+    """Queue ``task`` for ``instance`` unless the same job is already waiting."""
+    label = instance._meta.label_lower
+    if MediaJob.objects.filter(task=task, model=label, object_id=instance.pk, status='queued').exists():
+        return None
+    return MediaJob.objects.create(task=task, model=label, object_id=instance.pk)
+
+
+def file_checksum(field_file):
+    digest = hashlib.sha256()
+    with field_file.open('rb'):
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_copy(field_file):
+    """Return a filesystem path for ``field_file`` and whether it is a temporary copy."""
+    try:
+        return field_file.path, False
+    except NotImplementedError:
+        _, extension = os.path.splitext(field_file.name)
+        with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as copy, field_file.open('rb'):
+            shutil.copyfileobj(field_file, copy)
+        return copy.name, True
+
+
+def extract_poster(field_file):
+    """Grab a frame near the start of a video as a JPEG, returning its temp path."""
+    if shutil.which('ffmpeg') is None:
+        raise PermanentJobError('ffmpeg is not installed')
+    source, is_copy = local_copy(field_file)
+    poster = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
+    poster.close()
+    try:
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-ss', str(POSTER_OFFSET_SECONDS), '-i', source,
+             '-frames:v', '1', '-q:v', '3', poster.name],
+            check=True, capture_output=True, timeout=120
+        )
+    except subprocess.CalledProcessError as e:
+        os.unlink(poster.name)
+        raise PermanentJobError(e.stderr.decode(errors='replace').strip() or 'ffmpeg failed')
+    finally:
+        if is_copy:
+            os.unlink(source)
+    return poster.name
+
+
+def process_image_job(image):
+    original = image.image.name
+    strip_metadata(image.image)
+    if image.image.name != original:
+        # The stripped copy has its own content address. Leave the row alone
+        # if it was given a new upload while the job ran.
+        if type(image).objects.filter(pk=image.pk, image=original).update(image=image.image.name):
+            swap_reference(original, image.image.name)
+    process_image(image)
+    type(image).objects.filter(pk=image.pk).update(checksum=file_checksum(image.image))
+    if isinstance(image, PropertyImage):
+        # Pages rendered before the derivatives existed point at the original
+        invalidate_property(image.property_id, 'media')
+        invalidate_featured_stays(image.property_id)
+
+
+def process_video_job(video):
+    if not video.video:
+        return
+    changes = {'checksum': file_checksum(video.video)}
+    poster_path = extract_poster(video.video)
+    try:
+        stem, _ = os.path.splitext(os.path.basename(video.video.name))
+        with open(poster_path, 'rb') as poster:
+            changes['poster'] = video.poster.storage.save(
+                video.poster.field.generate_filename(video, f'{stem}.jpg'), File(poster)
+            )
+    finally:
+        os.unlink(poster_path)
+    type(video).objects.filter(pk=video.pk).update(**changes)
+    swap_reference(video.poster.name, changes['poster'])
+    invalidate_property(video.property_instance_id, 'media', listed=False)
+
+
+def process_profile_picture_job(owner):
+    if owner.profile_picture:
+        shrink_image(owner.profile_picture, AVATAR_MAX_SIZE)
+
+
+HANDLERS = {
+    'image': process_image_job,
+    'video': process_video_job,
+    'profile_picture': process_profile_picture_job,
+}
+
+
+def claim_jobs(limit, now=None):
+    """Mark up to ``limit`` due jobs as running and return their ids."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            MediaJob.objects.select_for_update(skip_locked=True).filter(
+                Q(status='queued', run_after__lte=now)
+                | Q(status='running', started_at__lte=now - STALLED_AFTER)
+            ).order_by('run_after').values_list('pk', flat=True)[:limit]
+        )
+        MediaJob.objects.filter(pk__in=ids).update(status='running', started_at=now)
+    return ids
+
+
+def run_job(job_id):
+    """Run one claimed job and record the outcome; returns its final status."""
+    job = MediaJob.objects.get(pk=job_id)
+    job.attempts += 1
+    try:
+        model = apps.get_model(job.model)
+        instance = model.objects.filter(pk=job.object_id).first()
+        # The upload may have been deleted while the job waited
+        if instance is not None:
+            HANDLERS[job.task](instance)
+    except Exception as e:
+        job.last_error = f'{type(e).__name__}: {e}'
+        if isinstance(e, PermanentJobError) or job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+        else:
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(minutes=2 ** job.attempts)
+    else:
+        job.status = 'done'
+        job.last_error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['attempts', 'status', 'run_after', 'last_error', 'finished_at'])
+    return job.status
+
+
+def init_worker():
+    # Children started with spawn need Django set up; forked ones must not
+    # reuse the parent's database connections
+    django.setup()
+    connections.close_all()
+
+
+def start_pool(workers):
+    connections.close_all()
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+
+
+def run_media_jobs(batch_size=20, pool=None):
+    """Claim one batch of jobs and run it, returning how many ran.
+
+    With a ``pool`` from ``start_pool()`` the batch is spread across its
+    processes; without one it runs here, which suits tests and small sites.
+    """
+    job_ids = claim_jobs(batch_size)
+    if pool is None:
+        for job_id in job_ids:
+            run_job(job_id)
+    elif job_ids:
+        list(pool.map(run_job, job_ids))
+    return len(job_ids)
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_stats(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    Review = apps.get_model('properties', 'Review')
+    Room = apps.get_model('properties', 'Room')
+
+    def per_property(queryset, expression):
+        return Subquery(
+            queryset.filter(property=OuterRef('pk')).values('property').annotate(
+                value=expression
+            ).values('value')
+        )
+
+    rooms = Room.objects.filter(is_available=True)
+    Property.objects.update(
+        avg_rating=per_property(Review.objects.all(), Avg('rating')),
+        review_count=Coalesce(per_property(Review.objects.all(), Count('pk')), 0),
+        min_price=per_property(rooms, Min('price_per_night')),
+        max_price=per_property(rooms, Max('price_per_night')),
+        available_rooms=Coalesce(per_property(rooms, Sum('total_rooms')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0004_property_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='available_rooms',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='avg_rating',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-avg_rating'], name='property_active_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['min_price'], name='property_active_price_idx'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
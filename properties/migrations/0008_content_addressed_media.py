@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:26
+
+import properties.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0007_media_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='image',
+            field=models.ImageField(storage=properties.storage.ContentAddressedStorage(), upload_to='property_images/'),
+        ),
+        migrations.AlterField(
+            model_name='propertyvideo',
+            name='poster',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=properties.storage.ContentAddressedStorage(), upload_to='property_videos/posters/'),
+        ),
+        migrations.AlterField(
+            model_name='propertyvideo',
+            name='video',
+            field=models.FileField(blank=True, null=True, storage=properties.storage.ContentAddressedStorage(), upload_to='property_videos/'),
+        ),
+        migrations.AlterField(
+            model_name='roomimage',
+            name='image',
+            field=models.ImageField(storage=properties.storage.ContentAddressedStorage(), upload_to='room_images/'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('orphaned_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('refcount__lte', 0)), fields=['orphaned_at'], name='mediablob_orphaned_idx')],
+            },
+        ),
+    ]
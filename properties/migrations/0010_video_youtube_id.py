@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:37
+
+import re
+
+from django.db import migrations, models
+
+# Copied from properties.models, as it stood when this migration was written
+YOUTUBE_ID_PATTERNS = [
+    re.compile(r'(?:youtube\.com\/watch\?v=)([\w-]{1,64})'),
+    re.compile(r'(?:youtu\.be\/)([\w-]{1,64})'),
+    re.compile(r'(?:youtube\.com\/embed\/)([\w-]{1,64})'),
+]
+
+
+def backfill_youtube_ids(apps, schema_editor):
+    PropertyVideo = apps.get_model('properties', 'PropertyVideo')
+    videos = []
+    for video in PropertyVideo.objects.exclude(youtube_link=''):
+        for pattern in YOUTUBE_ID_PATTERNS:
+            match = pattern.search(video.youtube_link)
+            if match:
+                video.youtube_id = match.group(1)
+                videos.append(video)
+                break
+    PropertyVideo.objects.bulk_update(videos, ['youtube_id'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0009_video_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyvideo',
+            name='youtube_id',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_youtube_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Geohashes are a fixed encoding, so the current implementation is safe to use
+from properties.geo import encode_geohash
+
+
+def backfill_geohashes(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    properties = list(Property.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for property_obj in properties:
+        property_obj.geohash = encode_geohash(property_obj.latitude, property_obj.longitude)
+    Property.objects.bulk_update(properties, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_video_youtube_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['geohash'], name='property_geohash_idx'),
+        ),
+        migrations.RunPython(backfill_geohashes, migrations.RunPython.noop),
+    ]
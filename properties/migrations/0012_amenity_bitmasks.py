@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+# Copied from properties.facets, as it stood when this migration was written
+PROPERTY_AMENITIES = ['wifi', 'parking', 'restaurant', 'gym', 'pool', 'spa', 'pets_allowed']
+ROOM_AMENITIES = ['air_conditioning', 'balcony', 'tv', 'mini_bar', 'room_service']
+
+
+def mask(obj, amenities):
+    return sum(1 << bit for bit, name in enumerate(amenities) if getattr(obj, name))
+
+
+def backfill_amenities(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    Room = apps.get_model('properties', 'Room')
+    properties = {prop.pk: prop for prop in Property.objects.all()}
+    for prop in properties.values():
+        prop.amenities = mask(prop, PROPERTY_AMENITIES)
+    for room in Room.objects.filter(is_available=True):
+        properties[room.property_id].room_amenities |= mask(room, ROOM_AMENITIES)
+    Property.objects.bulk_update(list(properties.values()), ['amenities', 'room_amenities'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0011_property_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='amenities',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='room_amenities',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_amenities, migrations.RunPython.noop),
+    ]
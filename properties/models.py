@@ -1,6 +1,14 @@
+import math
+import re
+import uuid
+
 from django.db import models
 from accounts.models import User
 from django.urls import reverse
+from django.utils import timezone
+from .facets import PROPERTY_AMENITIES, amenity_mask
+from .geo import encode_geohash
+from .storage import content_addressed_storage
 
 class PropertyType(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -17,6 +25,9 @@ class Property(models.Model):
         ('guesthouse', 'Guest House'),
     )
     
+    # Written only by stats.py, never by save() on an existing row
+    SUMMARY_FIELDS = ('avg_rating', 'review_count', 'min_price', 'max_price', 'available_rooms', 'room_amenities')
+    
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
     property_type = models.CharField(max_length=20, choices=PROPERTY_TYPES)
@@ -28,6 +39,8 @@ class Property(models.Model):
     postal_code = models.CharField(max_length=20)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Geohash of the coordinates, kept in step by save() (see geo.py)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
     
     # Amenities
     wifi = models.BooleanField(default=False)
@@ -37,6 +50,10 @@ class Property(models.Model):
     pool = models.BooleanField(default=False)
     spa = models.BooleanField(default=False)
     pets_allowed = models.BooleanField(default=False)
+    # Bitmasks of the amenities above, kept by save(), and of those of the
+    # available rooms, kept by the room stats (see facets.py)
+    amenities = models.PositiveIntegerField(default=0, editable=False)
+    room_amenities = models.PositiveIntegerField(default=0, editable=False)
     
     phone = models.CharField(max_length=15)
     email = models.EmailField()
@@ -47,9 +64,53 @@ class Property(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Summary columns maintained from Review and Room signals (see stats.py)
+    avg_rating = models.FloatField(null=True, blank=True, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    available_rooms = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Partial indexes over just the rows the public pages can show
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True), name='property_active_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True, is_featured=True), name='property_featured_idx'),
+            models.Index(fields=['-avg_rating'], condition=models.Q(is_active=True), name='property_active_rating_idx'),
+            models.Index(fields=['min_price'], condition=models.Q(is_active=True), name='property_active_price_idx'),
+            # Vendor property list, newest first
+            models.Index(fields=['owner', '-created_at'], name='property_owner_created_idx'),
+            # Radius and map searches, as ranges of geohash prefixes. Not
+            # partial, since SQLite only splits the OR of ranges into index
+            # searches when each range can use the index on its own
+            models.Index(fields=['geohash'], name='property_geohash_idx'),
+        ]
+    
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        located = self.latitude is not None and self.longitude is not None
+        self.geohash = encode_geohash(self.latitude, self.longitude) if located else ''
+        self.amenities = amenity_mask(self, PROPERTY_AMENITIES)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # stats.py keeps the summary columns with queryset updates, so an
+            # instance loaded before a room or review change must not write
+            # its stale copies back
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SUMMARY_FIELDS
+            ]
+        elif update_fields is not None:
+            derived = set()
+            if {'latitude', 'longitude'} & set(update_fields):
+                derived.add('geohash')
+            if {name for name, _ in PROPERTY_AMENITIES} & set(update_fields):
+                derived.add('amenities')
+            kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+    
     def get_absolute_url(self):
         return reverse('properties:property_detail', kwargs={'pk': self.pk})
     
@@ -60,22 +121,104 @@ class Property(models.Model):
             return min(room.price_per_night for room in rooms)
         return 0"""
 
-class PropertyImage(models.Model):
+class ResponsiveImage(models.Model):
+    """An uploaded photo served through resized derivatives.
+
+    ``derivatives`` is filled in by ``properties.images.generate_derivatives``
+    after upload; until then every URL falls back to the original file.
+    """
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    # SHA-256 of the stored original, filled in by the media worker
+    checksum = models.CharField(max_length=64, blank=True, editable=False)
+    
+    class Meta:
+        abstract = True
+    
+    @property
+    def has_derivatives(self):
+        return bool(self.image) and self.derivatives.get('source') == self.image.name
+    
+    def variant_url(self, name, webp=False):
+        if not self.has_derivatives:
+            return self.image.url if self.image else ''
+        return self.image.storage.url(self.derivatives['variants'][name]['webp' if webp else 'src'])
+    
+    def build_srcset(self, webp=False):
+        if not self.has_derivatives:
+            return ''
+        seen = set()
+        candidates = []
+        for variant in sorted(self.derivatives['variants'].values(), key=lambda variant: variant['width']):
+            # Small originals give several derivatives the same width
+            if variant['width'] not in seen:
+                seen.add(variant['width'])
+                url = self.image.storage.url(variant['webp' if webp else 'src'])
+                candidates.append(f"{url} {variant['width']}w")
+        return ', '.join(candidates)
+    
+    @property
+    def card_url(self):
+        return self.variant_url('card')
+    
+    @property
+    def gallery_url(self):
+        return self.variant_url('gallery')
+    
+    @property
+    def srcset(self):
+        return self.build_srcset()
+    
+    @property
+    def webp_srcset(self):
+        return self.build_srcset(webp=True)
+
+
+class PropertyImage(ResponsiveImage):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='property_images/')
+    image = models.ImageField(upload_to='property_images/', storage=content_addressed_storage)
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)  # This is the new field
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['property', 'is_primary'], name='propertyimage_primary_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.property.name} - Image"
 
 
+YOUTUBE_ID_PATTERNS = [
+    re.compile(r'(?:youtube\.com\/watch\?v=)([\w-]{1,64})'),
+    re.compile(r'(?:youtu\.be\/)([\w-]{1,64})'),
+    re.compile(r'(?:youtube\.com\/embed\/)([\w-]{1,64})'),
+]
+
+
+def parse_youtube_id(url):
+    """The video ID from any of the usual YouTube URL formats, or ''."""
+    for pattern in YOUTUBE_ID_PATTERNS:
+        match = pattern.search(url or '')
+        if match:
+            return match.group(1)
+    return ''
+
+
 class PropertyVideo(models.Model):
     property_instance = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='videos')  # Renamed from 'property'
-    video = models.FileField(upload_to='property_videos/', null=True, blank=True)
+    video = models.FileField(upload_to='property_videos/', storage=content_addressed_storage, null=True, blank=True)
     youtube_link = models.URLField(blank=True)
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
+    # Extracted from the uploaded file by the media worker
+    poster = models.ImageField(
+        upload_to='property_videos/posters/', storage=content_addressed_storage, null=True, blank=True, editable=False
+    )
+    checksum = models.CharField(max_length=64, blank=True, editable=False)
+    # Parsed from youtube_link on save, so rendering never runs the regexes
+    youtube_id = models.CharField(max_length=64, blank=True, editable=False)
     
     def __str__(self):
         return f"{self.property_instance.name} - Video"
@@ -84,21 +227,12 @@ class PropertyVideo(models.Model):
     def is_youtube(self):
         return bool(self.youtube_link)
     
-    @property
-    def youtube_id(self):
-        if self.is_youtube:
-            # Extract YouTube ID from various URL formats
-            import re
-            patterns = [
-                r'(?:youtube\.com\/watch\?v=)([^&]+)',
-                r'(?:youtu\.be\/)([^&]+)',
-                r'(?:youtube\.com\/embed\/)([^&]+)'
-            ]
-            for pattern in patterns:
-                match = re.search(pattern, self.youtube_link)
-                if match:
-                    return match.group(1)
-        return None
+    def save(self, *args, **kwargs):
+        self.youtube_id = parse_youtube_id(self.youtube_link)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'youtube_link' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'youtube_id'}
+        super().save(*args, **kwargs)
     
 
 class Room(models.Model):
@@ -131,9 +265,9 @@ class Room(models.Model):
     def __str__(self):
         return f"{self.property.name} - {self.name}"
 
-class RoomImage(models.Model):
+class RoomImage(ResponsiveImage):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='room_images/')
+    image = models.ImageField(upload_to='room_images/', storage=content_addressed_storage)
     caption = models.CharField(max_length=200, blank=True)
     
     def __str__(self):
@@ -149,6 +283,127 @@ class Review(models.Model):
     
     class Meta:
         unique_together = ('property', 'user')
+        indexes = [
+            # Newest-first review list on the detail page
+            models.Index(fields=['property', '-created_at'], name='review_property_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.property.name} - {self.rating} stars"
+
+
+class MediaJob(models.Model):
+    """A piece of upload processing deferred to the ``process_media_jobs`` worker.
+
+    ``model`` (an ``app_label.model_name`` label) and ``object_id`` name the
+    row whose upload it processes.
+    """
+    TASK_CHOICES = (
+        ('image', 'Image derivatives'),
+        ('video', 'Video poster'),
+        ('profile_picture', 'Profile picture'),
+    )
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    task = models.CharField(max_length=20, choices=TASK_CHOICES)
+    model = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker polls for due queued jobs and for stalled running ones
+            models.Index(fields=['status', 'run_after'], name='mediajob_status_due_idx'),
+            models.Index(fields=['model', 'object_id'], name='mediajob_target_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_task_display()} for {self.model} #{self.object_id} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    """A file in content-addressed storage, shared by every upload of the same bytes.
+
+    ``refcount`` is the number of file fields pointing at it. Once nothing
+    has pointed at a blob for a grace period, ``collect_media_garbage``
+    deletes it along with its derivatives.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When the last reference went away; cleared while the blob is in use
+    orphaned_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['orphaned_at'],
+                condition=models.Q(refcount__lte=0),
+                name='mediablob_orphaned_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+
+class VideoUpload(models.Model):
+    """A property video arriving in chunks, see ``properties.uploads``.
+
+    The primary key doubles as the token the client resumes the upload with.
+    """
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('assembling', 'Assembling'),
+        ('complete', 'Complete'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    property_instance = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='video_uploads')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    caption = models.CharField(max_length=200, blank=True)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # Optional SHA-256 of the whole file, checked after assembly
+    checksum = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    video = models.ForeignKey(PropertyVideo, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+    
+    @property
+    def chunk_count(self):
+        return math.ceil(self.size / self.chunk_size)
+    
+    def expected_chunk_size(self, index):
+        # Every chunk is full size except possibly the last
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+class VideoUploadChunk(models.Model):
+    upload = models.ForeignKey(VideoUpload, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'index'], name='videouploadchunk_unique_index'),
+        ]
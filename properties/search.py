@@ -0,0 +1,132 @@
+"""Full-text search over properties.
+
+The backend is picked from the database engine: SQLite uses an FTS5 table
+kept in step with ``Property`` by signals, Postgres a generated ``tsvector``
+column with a GIN index, and anything else falls back to ``icontains``.
+``PROPERTY_SEARCH_BACKEND`` may name a backend class to override the choice.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+class BaseSearchBackend:
+    def search(self, queryset, term):
+        """Filter ``queryset`` to properties matching ``term``, best match first."""
+        raise NotImplementedError
+
+    def index(self, property_obj):
+        """Add or refresh one property in the index."""
+
+    def remove(self, property_id):
+        """Drop one property from the index."""
+
+    def rebuild(self):
+        """Re-index every property from scratch."""
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Unindexed substring search, for engines without full-text support."""
+
+    def search(self, queryset, term):
+        return queryset.filter(
+            Q(name__icontains=term) | 
+            Q(city__icontains=term) | 
+            Q(description__icontains=term)
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 index whose rowids are property ids, ranked with BM25."""
+
+    table = 'properties_property_fts'
+    # Column weights for bm25(): a name hit outranks a city hit, which
+    # outranks a mention in the description
+    weights = (10.0, 5.0, 1.0)
+
+    def match_expression(self, term):
+        # Quote every word so user input can't inject FTS5 syntax, and match
+        # prefixes so results update as the guest types
+        words = re.findall(r'\w+', term)
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def search(self, queryset, term):
+        expression = self.match_expression(term)
+        if not expression:
+            return queryset.none()
+        
+        table = self.table
+        db_table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in self.weights)
+        rank = RawSQL(
+            f'SELECT bm25({table}, {weights}) FROM {table} '
+            f'WHERE {table} MATCH %s AND {table}.rowid = "{db_table}"."id"',
+            (expression,),
+            output_field=FloatField()
+        )
+        matches = RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', (expression,))
+        # bm25() scores better matches lower
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by('search_rank', '-pk')
+
+    def index(self, property_obj):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [property_obj.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, city, description) VALUES (%s, %s, %s, %s)',
+                [property_obj.pk, property_obj.name, property_obj.city, property_obj.description]
+            )
+
+    def remove(self, property_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [property_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, city, description) '
+                f'SELECT id, name, city, description FROM properties_property'
+            )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Generated, GIN-indexed ``search_document`` column ranked with ts_rank.
+
+    Postgres recomputes the column itself on every write, so there is
+    nothing to do on save or delete.
+    """
+
+    config = 'english'
+
+    def search(self, queryset, term):
+        if not term.strip():
+            return queryset.none()
+        db_table = queryset.model._meta.db_table
+        query = f"websearch_to_tsquery('{self.config}', %s)"
+        return queryset.annotate(
+            search_match=RawSQL(f'"{db_table}"."search_document" @@ {query}', (term,), output_field=BooleanField()),
+            search_rank=RawSQL(f'ts_rank("{db_table}"."search_document", {query})', (term,), output_field=FloatField()),
+        ).filter(search_match=True).order_by('-search_rank', '-pk')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    backend_path = getattr(settings, 'PROPERTY_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    return BACKENDS.get(connection.vendor, BasicSearchBackend)()
+
+
+def search_properties(queryset, term):
+    return get_search_backend().search(queryset, term)
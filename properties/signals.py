@@ -0,0 +1,185 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from accounts.models import Profile, User
+from .blobs import release, stored_names, swap_reference
+from .caching import invalidate_property
+from .featured import invalidate_featured_stays
+from .images import delete_derivatives
+from .lookups import listed_cities, listed_countries, property_type_descriptions
+from .media_jobs import enqueue_media_job
+from .models import MediaBlob, Property, PropertyImage, PropertyType, PropertyVideo, Review, Room, RoomImage
+from .search import get_search_backend
+from .stats import refresh_review_stats, refresh_room_stats
+
+SEARCH_FIELDS = {'name', 'city', 'description'}
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_save, sender=RoomImage)
+def queue_image_processing(sender, instance, **kwargs):
+    if instance.image and not instance.has_derivatives:
+        enqueue_media_job('image', instance)
+
+
+def loaded_file_name(instance, attname):
+    """The name a file field was loaded or last saved with; None if it was deferred."""
+    if attname not in instance.__dict__:
+        return None
+    value = instance.__dict__[attname]
+    return getattr(value, 'name', value) or ''
+
+
+def file_changed(instance, attname, created):
+    """Whether the save replaced the file in ``attname``, remembering the new name."""
+    current = loaded_file_name(instance, attname)
+    previous = '' if created else instance._loaded_file_name
+    instance._loaded_file_name = current
+    return bool(current) and current != previous
+
+
+@receiver(post_init, sender=PropertyVideo)
+def remember_video(sender, instance, **kwargs):
+    instance._loaded_file_name = loaded_file_name(instance, 'video')
+
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=Profile)
+def remember_profile_picture(sender, instance, **kwargs):
+    instance._loaded_file_name = loaded_file_name(instance, 'profile_picture')
+
+
+@receiver(post_save, sender=PropertyVideo)
+def queue_video_processing(sender, instance, created, **kwargs):
+    if file_changed(instance, 'video', created):
+        enqueue_media_job('video', instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def queue_profile_picture_processing(sender, instance, created, **kwargs):
+    if file_changed(instance, 'profile_picture', created):
+        enqueue_media_job('profile_picture', instance)
+
+
+@receiver(post_init, sender=PropertyImage)
+@receiver(post_init, sender=RoomImage)
+@receiver(post_init, sender=PropertyVideo)
+def remember_stored_files(sender, instance, **kwargs):
+    instance._stored_names = stored_names(instance)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_save, sender=RoomImage)
+@receiver(post_save, sender=PropertyVideo)
+def count_blob_references(sender, instance, created, **kwargs):
+    current = stored_names(instance)
+    previous = {} if created else instance._stored_names
+    for attname, name in current.items():
+        # A field deferred when the row was loaded has no known old name
+        if previous.get(attname, '') is not None:
+            swap_reference(previous.get(attname, ''), name)
+    instance._stored_names = current
+
+
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_delete, sender=RoomImage)
+@receiver(post_delete, sender=PropertyVideo)
+def release_blob_references(sender, instance, **kwargs):
+    for name in stored_names(instance).values():
+        release(name)
+
+
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_delete, sender=RoomImage)
+def remove_image_derivatives(sender, instance, **kwargs):
+    # Content-addressed originals may be shared, so their derivatives stay
+    # until the blob itself is collected
+    if not MediaBlob.objects.filter(name=instance.image.name).exists():
+        delete_derivatives(instance.derivatives, instance.image.storage)
+
+
+@receiver(post_save, sender=Property)
+def index_property(sender, instance, update_fields=None, **kwargs):
+    # Skip saves that can't have changed any searchable text
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Property)
+def unindex_property(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_review_stats(sender, instance, **kwargs):
+    refresh_review_stats([instance.property_id])
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def update_room_stats(sender, instance, **kwargs):
+    refresh_room_stats([instance.property_id])
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def expire_featured_property(sender, instance, **kwargs):
+    invalidate_featured_stays(instance.pk, instance.is_featured)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def expire_featured_children(sender, instance, **kwargs):
+    invalidate_featured_stays(instance.property_id)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def expire_property_pages(sender, instance, **kwargs):
+    invalidate_property(instance.pk)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def expire_location_lookups(sender, instance, **kwargs):
+    listed_cities.invalidate()
+    listed_countries.invalidate()
+
+
+@receiver(post_save, sender=PropertyType)
+@receiver(post_delete, sender=PropertyType)
+def expire_property_types(sender, instance, **kwargs):
+    property_type_descriptions.invalidate()
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def expire_room_pages(sender, instance, **kwargs):
+    invalidate_property(instance.property_id, 'rooms')
+    invalidate_property(instance.property_id, 'availability', listed=False)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def expire_review_pages(sender, instance, **kwargs):
+    invalidate_property(instance.property_id, 'reviews')
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def expire_image_pages(sender, instance, **kwargs):
+    invalidate_property(instance.property_id, 'media')
+
+
+@receiver(post_save, sender=PropertyVideo)
+@receiver(post_delete, sender=PropertyVideo)
+def expire_video_pages(sender, instance, **kwargs):
+    # Videos only appear on the detail page
+    invalidate_property(instance.property_instance_id, 'media', listed=False)
@@ -0,0 +1,67 @@
+"""Maintenance of the denormalized summary columns on ``Property``.
+
+Each refresh is a single ``UPDATE`` whose values come from correlated
+subqueries over the property's own reviews or rooms, so signal handlers can
+keep one property current and ``recompute_property_stats`` can repair every
+property with the same expressions.
+"""
+from django.db.models import Avg, Case, Count, Max, Min, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .facets import ROOM_AMENITIES, amenity_bit
+from .models import Property, Review, Room
+
+
+def _per_property(queryset, **aggregate):
+    (name, expression), = aggregate.items()
+    return Subquery(
+        queryset.filter(property=OuterRef('pk')).values('property').annotate(
+            **{name: expression}
+        ).values(name)
+    )
+
+
+def review_stats():
+    reviews = Review.objects.all()
+    return {
+        'avg_rating': _per_property(reviews, value=Avg('rating')),
+        'review_count': Coalesce(_per_property(reviews, value=Count('pk')), 0),
+    }
+
+
+def room_stats():
+    rooms = Room.objects.filter(is_available=True)
+    return {
+        'min_price': _per_property(rooms, value=Min('price_per_night')),
+        'max_price': _per_property(rooms, value=Max('price_per_night')),
+        'available_rooms': Coalesce(_per_property(rooms, value=Sum('total_rooms')), 0),
+        'room_amenities': Coalesce(_per_property(rooms, value=room_amenity_mask()), 0),
+    }
+
+
+def room_amenity_mask():
+    # A bitwise OR over the rooms, as a sum of each bit's MAX, since
+    # SQLite has no BIT_OR aggregate
+    bits = [
+        Max(Case(When(**{name: True}, then=Value(amenity_bit(ROOM_AMENITIES, name))), default=Value(0)))
+        for name, _ in ROOM_AMENITIES
+    ]
+    mask = bits[0]
+    for bit in bits[1:]:
+        mask = mask + bit
+    return mask
+
+
+def refresh_review_stats(property_ids):
+    Property.objects.filter(pk__in=property_ids).update(**review_stats())
+
+
+def refresh_room_stats(property_ids):
+    Property.objects.filter(pk__in=property_ids).update(**room_stats())
+
+
+def refresh_property_stats(queryset=None):
+    """Recompute every summary column for ``queryset`` (default: all properties)."""
+    if queryset is None:
+        queryset = Property.objects.all()
+    return queryset.update(**review_stats(), **room_stats())
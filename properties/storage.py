@@ -0,0 +1,71 @@
+"""Content-addressed storage for property and room media.
+
+Uploads are filed under the SHA-256 of their bytes, so the same photo
+uploaded to several properties is stored once and every row points at the
+same file. A name never changes content, which lets a CDN cache media
+indefinitely. Each stored file has a ``MediaBlob`` row counting its
+references; see ``properties.blobs`` for the counting and collection.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils import timezone
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def address(self, name, digest):
+        directory = os.path.dirname(name)
+        _, extension = os.path.splitext(name)
+        return f'{directory}/{digest[:2]}/{digest}{extension.lower()}'
+
+    def save(self, name, content, max_length=None):
+        """Store ``content`` under its digest, reusing the file if it is already stored.
+
+        Only the directory and extension of ``name`` are kept.
+        """
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        address = self.address(name, digest.hexdigest())
+        validate_file_name(address, allow_relative_path=True)
+
+        # Register before writing, so garbage collection can't remove a
+        # blob between this check and the row that will reference it
+        register_blob(address, size)
+        if not self.exists(address):
+            content.seek(0)
+            saved = self._save(address, content)
+            if saved != address:
+                # A concurrent upload of the same bytes got there first
+                self.delete(saved)
+        return address
+
+    @property
+    def derivative_storage(self):
+        # Derivatives are named after their source, which is already unique
+        return FileSystemStorage(location=self._location, base_url=self._base_url)
+
+
+def register_blob(name, size):
+    from .models import MediaBlob
+
+    blob, created = MediaBlob.objects.get_or_create(
+        name=name, defaults={'size': size, 'orphaned_at': timezone.now()}
+    )
+    if not created and blob.refcount <= 0:
+        # A blob waiting to be collected gets a fresh grace period
+        MediaBlob.objects.filter(pk=blob.pk, refcount__lte=0).update(orphaned_at=timezone.now())
+    return blob
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -0,0 +1,138 @@
+"""Serve stored video files with HTTP range requests.
+
+Players fetch a video in byte ranges as the viewer seeks, so responses
+honour ``Range`` and ``If-Range`` and carry a strong ``ETag``. The file is
+handed to the server as an open file positioned at the range start; WSGI
+servers with ``wsgi.file_wrapper`` support, such as gunicorn, send it with
+``sendfile()`` and never copy the bytes through Python.
+"""
+import mimetypes
+import os
+import re
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import ContentAddressedStorage
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class UnsatisfiableRange(Exception):
+    pass
+
+
+class FileRange:
+    """A read-only view of ``length`` bytes of an open file from ``start``.
+
+    ``fileno()`` and ``tell()`` let a server's file wrapper ``sendfile()``
+    the range directly, bounded by the response's Content-Length. Servers
+    without one read it in blocks, which stop at the end of the range.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Return the inclusive ``(start, end)`` of a single byte range.
+
+    Returns None for headers that should be ignored, which includes
+    requests for several ranges; the whole file is served instead.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # A suffix range: the final ``last`` bytes
+        if int(last) == 0:
+            raise UnsatisfiableRange
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise UnsatisfiableRange
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def file_etag(field_file, stat):
+    stem, _ = os.path.splitext(os.path.basename(field_file.name))
+    # Content-addressed names are already a digest of the bytes
+    if isinstance(field_file.storage, ContentAddressedStorage) and DIGEST_RE.match(stem):
+        return f'"{stem}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def range_applies(if_range, etag, last_modified):
+    """Whether a Range may be honoured given the request's If-Range validator."""
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # If-Range needs a strong match, which weak tags never are
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def stream_file(request, field_file):
+    """Respond with ``field_file``, or the byte range the request asks for."""
+    path = field_file.path
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_etag(field_file, stat)
+    last_modified = int(stat.st_mtime)
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if if_none_match == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if request.headers.get('Range') and range_applies(request.headers.get('If-Range'), etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except UnsatisfiableRange:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = FileResponse(
+        FileRange(open(path, 'rb'), start, end - start + 1),
+        content_type=content_type,
+        status=206 if byte_range else 200,
+    )
+    response.block_size = STREAM_BLOCK_SIZE
+    response['Content-Length'] = end - start + 1
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Revalidating with the ETag is cheap, and a replaced video shows at once
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
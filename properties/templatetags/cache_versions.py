@@ -0,0 +1,12 @@
+from django import template
+
+from properties.caching import property_tag
+from pano.caching import tag_versions
+
+register = template.Library()
+
+
+@register.simple_tag
+def property_cache_version(property_id, part=None):
+    """Use as a ``{% cache %}`` vary-on argument so the fragment follows the tag."""
+    return tag_versions([property_tag(property_id, part)])[0]
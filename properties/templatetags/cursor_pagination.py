@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor):
+    """The current URL's query string with ``cursor`` in place of any page or cursor."""
+    query = context['request'].GET.copy()
+    query.pop('page', None)
+    query['cursor'] = cursor
+    return f'?{query.urlencode()}'
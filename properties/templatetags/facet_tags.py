@@ -0,0 +1,20 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def facet_url(context, facet, option):
+    """The current URL's query string with ``option`` toggled, back on the first page."""
+    query = context['request'].GET.copy()
+    for key in ('page', 'cursor'):
+        query.pop(key, None)
+    values = query.getlist(facet['name'])
+    if option['value'] in values:
+        values.remove(option['value'])
+    elif facet['multiple']:
+        values.append(option['value'])
+    else:
+        values = [option['value']]
+    query.setlist(facet['name'], values)
+    return f'?{query.urlencode()}'
@@ -1,3 +1,1142 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipIf
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from accounts.models import User
+from pano.caching import get_cache
+from pano.lookups import CachedLookup
+from bookings.models import Booking
+from bookings.tests import make_booking, make_property, make_room
+from .blobs import collect_garbage, recount_references
+from .facets import PROPERTY_AMENITIES, ROOM_AMENITIES, amenity_bit, amenity_mask, facet_counts
+from .forms import PropertyForm
+from .geo import covering_cells, encode_geohash, nearby
+from .lookups import listed_cities, listed_countries, property_type_descriptions
+from .media_jobs import MAX_ATTEMPTS as MEDIA_JOB_ATTEMPTS, run_media_jobs, start_pool
+from .models import MediaBlob, MediaJob, Property, PropertyImage, PropertyType, PropertyVideo, Review, VideoUpload
+from .search import search_properties
+from .uploads import expire_uploads
+from .views import PropertyListView, VendorPropertyListView
+
+
+class SearchAvailabilityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.check_in = timezone.now().date() + timedelta(days=7)
+        self.check_out = self.check_in + timedelta(days=3)
+        self.properties = [make_property(self.user, name=f'Stay {i}') for i in range(12)]
+        for prop in self.properties:
+            make_room(prop, price_per_night=120, total_rooms=2)
+            make_room(prop, price_per_night=80, total_rooms=1)
+
+    def search(self, **params):
+        params.setdefault('check_in', self.check_in.isoformat())
+        params.setdefault('check_out', self.check_out.isoformat())
+        return self.client.get(reverse('properties:search_availability'), params)
+
+    def test_query_count_is_independent_of_page_size(self):
+        ids = ','.join(str(prop.pk) for prop in self.properties)
+        with self.assertNumQueries(2):
+            response = self.search(property_ids=ids)
+        self.assertEqual(len(response.json()['results']), 12)
+
+    def test_returns_cheapest_free_room_and_total(self):
+        first = self.properties[0]
+        cheap_room = first.room_set.get(price_per_night=80)
+        make_booking(self.user, cheap_room, self.check_in, nights=1)
+        response = self.search(property_ids=str(first.pk), guests=2)
+        result = response.json()['results'][0]
+        self.assertTrue(result['available'])
+        self.assertEqual(result['price'], 120.0)
+        self.assertEqual(result['total_price'], 360.0)
+
+    def test_reports_sold_out_properties(self):
+        first = self.properties[0]
+        for room in first.room_set.all():
+            for _ in range(room.total_rooms):
+                make_booking(self.user, room, self.check_in)
+        response = self.search(property_ids=str(first.pk))
+        self.assertEqual(response.json()['results'], [{'property_id': first.pk, 'available': False}])
+
+    def test_search_term_selects_properties(self):
+        response = self.search(search='Stay 1')
+        ids = [result['property_id'] for result in response.json()['results']]
+        # "Stay 1", "Stay 10" and "Stay 11"
+        self.assertEqual(len(ids), 3)
+
+    def test_missing_parameters(self):
+        response = self.search()
+        self.assertEqual(response.status_code, 400)
+
+
+class PropertySearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.by_name = make_property(self.user, name='Victoria Falls Lodge', city='Livingstone')
+        self.by_city = make_property(self.user, name='River House', city='Victoria')
+        self.by_description = make_property(
+            self.user, name='Bush Camp', description='A short drive from Victoria Falls'
+        )
+        make_property(self.user, name='City Motel', city='Ndola')
+
+    def search(self, term):
+        return list(search_properties(Property.objects.all(), term))
+
+    def test_results_are_ranked_by_field_weight(self):
+        self.assertEqual(self.search('victoria'), [self.by_name, self.by_city, self.by_description])
+
+    def test_prefix_match_while_typing(self):
+        self.assertEqual(self.search('livings'), [self.by_name])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.by_city.name = 'Zambezi Retreat'
+        self.by_city.save()
+        self.assertEqual(self.search('zambezi'), [self.by_city])
+        self.assertEqual(self.search('river'), [])
+        self.by_city.delete()
+        self.assertEqual(self.search('zambezi'), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"bush" -camp*'), [self.by_description])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_listing_uses_search_backend(self):
+        response = self.client.get(reverse('properties:property_list'), {'search': 'victoria falls'})
+        self.assertEqual(list(response.context['properties']), [self.by_name, self.by_description])
+
+
+class PropertyStatsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.guests = [
+            User.objects.create_user(username=f'guest{i}', email=f'guest{i}@example.com', password='pw')
+            for i in range(2)
+        ]
+        self.property = make_property(self.owner)
+
+    def review(self, guest, rating):
+        return Review.objects.create(property=self.property, user=guest, rating=rating, title='Stay', comment='Stay')
+
+    def test_review_signals_maintain_rating(self):
+        first = self.review(self.guests[0], 5)
+        self.review(self.guests[1], 2)
+        self.property.refresh_from_db()
+        self.assertEqual((self.property.avg_rating, self.property.review_count), (3.5, 2))
+        first.delete()
+        self.property.refresh_from_db()
+        self.assertEqual((self.property.avg_rating, self.property.review_count), (2.0, 1))
+
+    def test_saving_a_stale_instance_keeps_the_summary(self):
+        stale = Property.objects.get(pk=self.property.pk)
+        make_room(self.property, price_per_night=80, balcony=True)
+        self.review(self.guests[0], 4)
+        stale.is_featured = True
+        stale.save()
+        self.property.refresh_from_db()
+        self.assertTrue(self.property.is_featured)
+        self.assertEqual((self.property.min_price, self.property.review_count), (80, 1))
+        self.assertEqual(self.property.room_amenities, amenity_bit(ROOM_AMENITIES, 'balcony'))
+
+    def test_room_signals_maintain_prices_and_inventory(self):
+        make_room(self.property, price_per_night=80, total_rooms=4)
+        suite = make_room(self.property, price_per_night=250, total_rooms=1)
+        make_room(self.property, price_per_night=20, is_available=False)
+        self.property.refresh_from_db()
+        self.assertEqual((self.property.min_price, self.property.max_price), (80, 250))
+        self.assertEqual(self.property.available_rooms, 5)
+        suite.delete()
+        self.property.refresh_from_db()
+        self.assertEqual((self.property.max_price, self.property.available_rooms), (80, 4))
+
+    def test_recompute_command_repairs_drift(self):
+        self.review(self.guests[0], 4)
+        make_room(self.property, price_per_night=99)
+        Property.objects.update(avg_rating=None, review_count=0, min_price=None, available_rooms=0)
+        call_command('recompute_property_stats', stdout=StringIO())
+        self.property.refresh_from_db()
+        self.assertEqual(
+            (self.property.avg_rating, self.property.review_count, self.property.min_price, self.property.available_rooms),
+            (4.0, 1, 99, 1)
+        )
+
+    def test_listing_sorts_on_summary_columns(self):
+        cheap = make_property(self.owner, name='Cheap')
+        make_room(cheap, price_per_night=10)
+        make_room(self.property, price_per_night=500)
+        unpriced = make_property(self.owner, name='Unpriced')
+        response = self.client.get(reverse('properties:property_list'), {'sort': 'price_low'})
+        self.assertEqual(list(response.context['properties']), [cheap, self.property, unpriced])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pw', role='vendor', is_active=True
+        )
+        created = timezone.now()
+        self.properties = []
+        for i in range(7):
+            prop = make_property(self.owner, name=f'Stay {i}')
+            # Ties on both sort columns, and some unrated stays
+            Property.objects.filter(pk=prop.pk).update(
+                created_at=created - timedelta(days=i // 2), avg_rating=[None, 4.0, 3.0][i % 3]
+            )
+            self.properties.append(prop)
+
+    def walk(self, params):
+        """Every page's names following next links, then back via previous links."""
+        url = reverse('properties:property_list')
+        pages = []
+        context = self.client.get(url, params).context
+        while True:
+            pages.append([prop.name for prop in context['properties']])
+            if not context['page_obj'].has_next():
+                break
+            context = self.client.get(url, {**params, 'cursor': context['page_obj'].next_cursor}).context
+        backwards = [pages[-1]]
+        while context['page_obj'].has_previous():
+            context = self.client.get(url, {**params, 'cursor': context['page_obj'].previous_cursor}).context
+            backwards.append([prop.name for prop in context['properties']])
+        return pages, backwards[::-1]
+
+    def expected(self, ordering):
+        names = list(Property.objects.order_by(*ordering).values_list('name', flat=True))
+        return [names[i:i + 3] for i in range(0, len(names), 3)]
+
+    @patch.object(PropertyListView, 'paginate_by', 3)
+    def test_pages_follow_the_sort_through_ties_and_nulls(self):
+        for sort, ordering in [
+            ('newest', ['-created_at', '-pk']),
+            ('rating', [F('avg_rating').desc(nulls_last=True), '-created_at', '-pk']),
+        ]:
+            with self.subTest(sort=sort):
+                forwards, backwards = self.walk({'sort': sort})
+                self.assertEqual(forwards, self.expected(ordering))
+                self.assertEqual(backwards, forwards)
+
+    @patch.object(PropertyListView, 'paginate_by', 2)
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        url = reverse('properties:property_list')
+        with CaptureQueriesContext(connection) as first:
+            context = self.client.get(url).context
+        for _ in range(2):
+            context = self.client.get(url, {'cursor': context['page_obj'].next_cursor}).context
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(url, {'cursor': context['page_obj'].next_cursor})
+        self.assertEqual(len(deep), len(first))
+        # Facet counts aside, nothing counts or skips rows
+        self.assertFalse(any('COUNT(*)' in query['sql'] or 'OFFSET' in query['sql'] for query in deep))
+
+    def test_tampered_cursor_falls_back_to_the_first_page(self):
+        url = reverse('properties:property_list')
+        first = self.client.get(url).context['properties']
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(list(response.context['properties']), list(first))
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    @patch.object(VendorPropertyListView, 'paginate_by', 3)
+    def test_vendor_list_totals_cover_every_page(self):
+        Property.objects.filter(pk=self.properties[0].pk).update(avg_rating=4.0, review_count=2)
+        Property.objects.filter(pk=self.properties[1].pk).update(avg_rating=1.0, review_count=1)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('properties:vendor_properties'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['properties']), 3)
+        self.assertEqual(response.context['total_properties'], 7)
+        self.assertAlmostEqual(response.context['average_rating'], 3.0)
+        self.assertTrue(response.context['page_obj'].has_next())
+
+
+class GeoSearchTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.lusaka = make_property(self.owner, name='Lusaka', latitude=Decimal('-15.4167'), longitude=Decimal('28.2833'))
+        self.chongwe = make_property(self.owner, name='Chongwe', latitude=Decimal('-15.3292'), longitude=Decimal('28.6820'))
+        self.kafue = make_property(self.owner, name='Kafue', latitude=Decimal('-15.7691'), longitude=Decimal('28.1814'))
+        self.livingstone = make_property(
+            self.owner, name='Livingstone', latitude=Decimal('-17.8419'), longitude=Decimal('25.8543')
+        )
+        self.unlocated = make_property(self.owner, name='Unlocated')
+
+    def test_save_keeps_the_geohash_in_step(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(self.lusaka.geohash, 'ktk0797r0')
+        self.assertEqual(self.unlocated.geohash, '')
+        self.lusaka.latitude, self.lusaka.longitude = Decimal('-17.8'), Decimal('25.85')
+        self.lusaka.save(update_fields=['latitude', 'longitude'])
+        self.lusaka.refresh_from_db()
+        self.assertEqual(self.lusaka.geohash, encode_geohash(-17.8, 25.85))
+
+    def test_nearby_sorts_by_distance_within_the_radius(self):
+        found = list(nearby(Property.objects.all(), -15.4167, 28.2833, 50))
+        self.assertEqual(found, [self.lusaka, self.kafue, self.chongwe])
+        self.assertAlmostEqual(found[2].distance, 43.84, places=2)
+
+    def test_covering_cells_wrap_across_the_antimeridian(self):
+        cells = covering_cells(-1, 179, 1, -179)
+        self.assertIn(encode_geohash(0, 179.5, len(cells[0])), cells)
+        self.assertIn(encode_geohash(0, -179.5, len(cells[0])), cells)
+        self.assertNotIn(encode_geohash(0, 0, len(cells[0])), cells)
+
+    def test_list_view_near_a_point(self):
+        response = self.client.get(reverse('properties:property_list'), {'lat': '-15.42', 'lng': '28.28', 'radius': '30'})
+        self.assertEqual(list(response.context['properties']), [self.lusaka])
+        self.assertContains(response, 'km away')
+        # Nonsense coordinates are ignored rather than rejected
+        response = self.client.get(reverse('properties:property_list'), {'lat': '95', 'lng': '28.28'})
+        self.assertEqual(len(response.context['properties']), 5)
+
+    def test_map_clusters_the_viewport_in_one_query(self):
+        for i in range(30):
+            make_property(self.owner, name=f'Camp {i}', latitude=Decimal('-15.40') - Decimal('0.0001') * i, longitude=Decimal('28.30'))
+        with self.assertNumQueries(1):
+            clusters = self.client.get(reverse('properties:property_map'), {'bbox': '-16,28,-15,29'}).json()['clusters']
+        self.assertEqual(sum(cluster['count'] for cluster in clusters), 33)
+        self.assertLess(len(clusters), 33)
+        self.assertIn({'Kafue'}, [{cluster.get('name')} for cluster in clusters])
+        response = self.client.get(reverse('properties:property_map'), {'bbox': '-15,28,-16,29'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.resort = make_property(self.owner, name='Resort', property_type='hotel', pool=True, wifi=True)
+        make_room(self.resort, price_per_night=150, tv=True)
+        make_room(self.resort, price_per_night=90, balcony=True, is_available=False)
+        Property.objects.filter(pk=self.resort.pk).update(avg_rating=4.5)
+        self.camp = make_property(self.owner, name='Camp', property_type='lodge', pool=True)
+        make_room(self.camp, price_per_night=40)
+        self.inn = make_property(self.owner, name='Inn', property_type='guesthouse', wifi=True)
+        make_room(self.inn, price_per_night=60, tv=True)
+
+    def counts(self, response):
+        return {
+            facet['name']: {option['value']: option['count'] for option in facet['options']}
+            for facet in response.context['facets']
+        }
+
+    def test_bitmasks_follow_the_property_and_its_available_rooms(self):
+        self.resort.refresh_from_db()
+        self.assertEqual(self.resort.amenities, amenity_mask(self.resort, PROPERTY_AMENITIES))
+        self.assertEqual(self.resort.room_amenities, amenity_bit(ROOM_AMENITIES, 'tv'))
+        self.resort.pool = False
+        self.resort.save(update_fields=['pool'])
+        self.resort.refresh_from_db()
+        self.assertEqual(self.resort.amenities, amenity_bit(PROPERTY_AMENITIES, 'wifi'))
+
+    def test_amenities_narrow_each_other(self):
+        response = self.client.get(reverse('properties:property_list'), {'amenity': ['pool', 'tv']})
+        self.assertEqual(list(response.context['properties']), [self.resort])
+        counts = self.counts(response)
+        self.assertEqual(counts['amenity']['wifi'], 1)
+        self.assertEqual(counts['amenity']['balcony'], 0)
+        self.assertContains(response, 'Pool (1)')
+
+    def test_single_choice_groups_are_counted_without_their_own_selection(self):
+        response = self.client.get(reverse('properties:property_list'), {'type': 'lodge', 'amenity': 'pool'})
+        self.assertEqual(list(response.context['properties']), [self.camp])
+        counts = self.counts(response)
+        self.assertEqual(counts['type'], {'hotel': 1, 'lodge': 1, 'motel': 0, 'guesthouse': 0})
+        self.assertEqual(counts['price'], {'under-50': 1, '50-100': 0, '100-200': 0, '200-plus': 0})
+        self.assertEqual(counts['rating'], {'4': 0, '3': 0})
+
+    def test_every_count_comes_from_one_query(self):
+        selected = {'amenity': ['wifi'], 'price': ['50-100']}
+        with self.assertNumQueries(1):
+            facets = facet_counts(Property.objects.all(), selected, Property.PROPERTY_TYPES)
+        self.assertEqual(sum(len(facet['options']) for facet in facets), 22)
+
+
+class FeaturedStaysTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.featured = []
+        for i in range(6):
+            prop = make_property(self.owner, name=f'Featured {i}', is_featured=True)
+            make_room(prop, price_per_night=50 + i)
+            PropertyImage.objects.create(property=prop, image=f'property_images/{i}a.jpg')
+            PropertyImage.objects.create(property=prop, image=f'property_images/{i}b.jpg', is_primary=i % 2 == 0)
+            self.featured.append(prop)
+
+    def get_stays(self):
+        return self.client.get(reverse('properties:home')).context['featured_stays']
+
+    def test_fixed_query_count_and_cover_images(self):
+        with self.assertNumQueries(2):
+            stays = self.get_stays()
+        covers = {stay['id']: stay['image_url'] for stay in stays}
+        self.assertEqual(covers[self.featured[0].pk], '/media/property_images/0b.jpg')
+        self.assertEqual(covers[self.featured[1].pk], '/media/property_images/1a.jpg')
+
+    def test_served_from_cache(self):
+        self.get_stays()
+        with self.assertNumQueries(0):
+            self.get_stays()
+
+    def test_child_changes_invalidate(self):
+        self.get_stays()
+        make_room(self.featured[3], price_per_night=5)
+        stays = {stay['id']: stay for stay in self.get_stays()}
+        self.assertEqual(stays[self.featured[3].pk]['price'], 5)
+
+    def test_review_lifting_a_featured_property_into_the_block_invalidates(self):
+        guest = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        for prop in self.featured:
+            Review.objects.create(property=prop, user=guest, rating=3, title='Fine', comment='Fine')
+        outside = make_property(self.owner, name='Featured 6', is_featured=True)
+        self.assertNotIn(outside.pk, [stay['id'] for stay in self.get_stays()])
+        Review.objects.create(property=outside, user=guest, rating=5, title='Great', comment='Great')
+        self.assertEqual(self.get_stays()[0]['id'], outside.pk)
+
+    def test_unrelated_changes_keep_cache(self):
+        self.get_stays()
+        other = make_property(self.owner, name='Not featured')
+        make_room(other)
+        with self.assertNumQueries(0):
+            self.get_stays()
+
+    def test_unfeaturing_invalidates(self):
+        self.get_stays()
+        self.featured[0].is_featured = False
+        self.featured[0].save()
+        ids = [stay['id'] for stay in self.get_stays()]
+        self.assertNotIn(self.featured[0].pk, ids)
+
+
+class VendorDashboardTests(TestCase):
+    def setUp(self):
+        self.vendor = User.objects.create_user(
+            username='vendor', email='vendor@example.com', password='pw', role='vendor', is_active=True
+        )
+        self.guest = User.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        self.check_in = timezone.now().date() + timedelta(days=5)
+        self.client.force_login(self.vendor)
+
+    def add_property(self, name):
+        prop = make_property(self.vendor, name=name)
+        room = make_room(prop, total_rooms=2)
+        make_room(prop, room_type='suite')
+        PropertyImage.objects.create(property=prop, image=f'property_images/{name}.jpg')
+        make_booking(self.guest, room, self.check_in, nights=3)
+        make_booking(self.guest, room, self.check_in, status='pending')
+        return prop
+
+    def dashboard(self):
+        call_command('rollup_bookings', stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('properties:vendor_dashboard'))
+        return response, len(queries)
+
+    def test_query_count_is_independent_of_portfolio_size(self):
+        for i in range(2):
+            self.add_property(f'Stay {i}')
+        _, small = self.dashboard()
+        for i in range(2, 12):
+            self.add_property(f'Stay {i}')
+        response, large = self.dashboard()
+        self.assertEqual(small, large)
+        self.assertEqual(response.context['total_rooms'], 24)
+
+    def test_bookings_since_the_last_rollup_are_counted(self):
+        old = self.add_property('Stay')
+        call_command('rollup_bookings', stdout=StringIO())
+        # Made and rolled up last week, so only the rollup row counts it
+        Booking.objects.update(
+            created_at=timezone.now() - timedelta(days=7), updated_at=timezone.now() - timedelta(days=7)
+        )
+        call_command('rollup_bookings', '--full', stdout=StringIO())
+        new = self.add_property('New Stay')
+        make_booking(self.guest, old.room_set.first(), self.check_in + timedelta(days=10), nights=2)
+        response = self.client.get(reverse('properties:vendor_dashboard'))
+        self.assertEqual((response.context['total_bookings'], response.context['confirmed_bookings']), (5, 3))
+        stats = {stat['property'].pk: stat['booking_count'] for stat in response.context['properties_with_stats']}
+        self.assertEqual(stats, {old.pk: 3, new.pk: 2})
+        response = self.client.get(reverse('accounts:vendor_dashboard'))
+        self.assertEqual(response.context['monthly_stats']['total_bookings'], 3)
+
+    def test_occupancy_endpoint(self):
+        self.add_property('Stay')
+        start = self.check_in - timedelta(days=1)
+        response = self.client.get(reverse('properties:vendor_occupancy'), {
+            'start': start.isoformat(), 'end': (start + timedelta(days=5)).isoformat(),
+        })
+        data = response.json()
+        # Three confirmed nights out of three units a night
+        self.assertEqual((data['sold'], data['available']), (3, 15))
+        self.assertEqual([day['sold'] for day in data['days']], [0, 1, 1, 1, 0])
+
+    def test_totals(self):
+        prop = self.add_property('Stay')
+        response, _ = self.dashboard()
+        context = response.context
+        self.assertEqual(
+            (context['total_bookings'], context['confirmed_bookings'], context['pending_bookings']), (2, 1, 1)
+        )
+        self.assertEqual(context['total_revenue'], 300)
+        self.assertEqual(context['properties_with_stats'], [
+            {'property': prop, 'booking_count': 2, 'revenue': 300, 'room_count': 2}
+        ])
+
+
+class LookupCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.lodge = make_property(self.owner, city='Lusaka')
+        make_property(self.owner, city='Lusaka')
+        make_property(self.owner, city='Ndola', is_active=False)
+
+    def test_loads_once_per_process_until_invalidated(self):
+        self.assertEqual(listed_cities(), [('Lusaka', 'Zambia', 2)])
+        with self.assertNumQueries(0):
+            listed_cities()
+        self.lodge.city = 'Kitwe'
+        self.lodge.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(listed_cities(), [('Kitwe', 'Zambia', 1), ('Lusaka', 'Zambia', 1)])
+
+    def test_invalidation_reaches_other_processes(self):
+        # Another worker's copy of the same lookup, with its own connection
+        # to the configured cache, so only what the backend shares between
+        # processes reaches it
+        other_cache = caches.create_connection(settings.PAGE_CACHE_ALIAS)
+        self.assertNotIsInstance(other_cache, LocMemCache)
+        other_worker = CachedLookup(listed_countries.__wrapped__, ())
+        with patch('pano.caching.get_cache', return_value=other_cache):
+            self.assertEqual(other_worker(), ['Zambia'])
+        make_property(self.owner, country='Malawi')
+        with patch('pano.caching.get_cache', return_value=other_cache), self.assertNumQueries(1):
+            self.assertEqual(other_worker(), ['Malawi', 'Zambia'])
+
+    def test_property_types_follow_the_admin_table(self):
+        self.assertEqual(property_type_descriptions(), {})
+        PropertyType.objects.create(name='Lodge', description='Rustic stays near the parks')
+        form = PropertyForm()
+        self.assertEqual(form.property_type_help, [('Lodge', 'Rustic stays near the parks')])
+        with self.assertNumQueries(0):
+            PropertyForm()
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        self.property = make_property(self.owner, name='Lakeside Lodge')
+        self.other = make_property(self.owner, name='Hilltop Camp')
+        self.room = make_room(self.property)
+        PropertyImage.objects.create(property=self.property, image='property_images/lake.jpg')
+
+    def detail(self, prop):
+        return self.client.get(reverse('properties:property_detail', args=[prop.pk]))
+
+    def review(self, prop, title):
+        return Review.objects.create(property=prop, user=self.owner, rating=4, title=title, comment='Lovely')
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        self.detail(self.property)
+        self.client.get(reverse('properties:property_list'))
+        with self.assertNumQueries(0):
+            self.assertContains(self.detail(self.property), 'Lakeside Lodge')
+            self.assertContains(self.client.get(reverse('properties:property_list')), 'Hilltop Camp')
+
+    def test_saves_evict_only_dependent_pages(self):
+        self.detail(self.property)
+        self.detail(self.other)
+        self.review(self.property, 'Quiet and clean')
+        self.assertContains(self.detail(self.property), 'Quiet and clean')
+        with self.assertNumQueries(0):
+            self.detail(self.other)
+
+    def test_bookings_evict_availability_but_not_pages(self):
+        params = {
+            'room_type': 'double', 'property_id': self.property.pk,
+            'check_in': (timezone.now().date() + timedelta(days=3)).isoformat(),
+            'check_out': (timezone.now().date() + timedelta(days=5)).isoformat(),
+        }
+        url = reverse('bookings:check_availability')
+        self.detail(self.property)
+        self.assertTrue(self.client.get(url, params).json()['available'])
+        make_booking(self.owner, self.room, timezone.now().date() + timedelta(days=3))
+        self.assertFalse(self.client.get(url, params).json()['available'])
+        with self.assertNumQueries(0):
+            self.detail(self.property)
+
+    def test_signed_in_users_get_cached_fragments(self):
+        self.review(self.property, 'Quiet and clean')
+        self.client.force_login(self.owner)
+        with CaptureQueriesContext(connection) as first:
+            self.detail(self.property)
+        with CaptureQueriesContext(connection) as second:
+            response = self.detail(self.property)
+        self.assertContains(response, 'Quiet and clean')
+        self.assertContains(response, 'lake.jpg')
+        self.assertLess(len(second), len(first))
+        # The page ships only the first gallery item, which the primary photo leads
+        PropertyImage.objects.create(property=self.property, image='property_images/dock.jpg', is_primary=True)
+        self.assertContains(self.detail(self.property), 'dock.jpg')
+
+
+def make_upload(width, height, name='photo.jpg', exif=None):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, 'JPEG', exif=exif or b'')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class TemporaryMediaMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_cache().clear()
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='pw', role='vendor', is_active=True
+        )
+        self.property = make_property(self.owner, is_featured=True)
+
+
+class ImageDerivativeTests(TemporaryMediaMixin, TestCase):
+    def upload(self, width, height):
+        image = PropertyImage.objects.create(property=self.property, image=make_upload(width, height))
+        run_media_jobs()
+        image.refresh_from_db()
+        return image
+
+    def test_upload_builds_resized_and_webp_copies(self):
+        image = self.upload(2400, 1200)
+        self.assertEqual((image.width, image.height), (2400, 1200))
+        variants = image.derivatives['variants']
+        self.assertEqual({name: variant['width'] for name, variant in variants.items()}, {
+            'card': 480, 'gallery': 1024, 'full': 1920,
+        })
+        with default_storage.open(variants['card']['webp']) as webp:
+            self.assertEqual(Image.open(webp).format, 'WEBP')
+        with default_storage.open(variants['gallery']['src']) as jpeg:
+            self.assertEqual(Image.open(jpeg).size, (1024, 512))
+        self.assertTrue(image.card_url.endswith('-card.jpg'))
+        self.assertEqual(image.webp_srcset.count('.webp'), 3)
+
+    def test_small_images_are_not_upscaled(self):
+        image = self.upload(300, 200)
+        self.assertEqual(image.srcset, f'{image.card_url} 300w')
+
+    def test_pages_ship_srcsets(self):
+        image = self.upload(1200, 800)
+        home = self.client.get(reverse('properties:home'))
+        self.assertContains(home, image.webp_srcset)
+        detail = self.client.get(reverse('properties:property_detail', args=[self.property.pk]))
+        self.assertContains(detail, image.gallery_url)
+
+    def test_collecting_a_deleted_image_removes_its_derivatives(self):
+        image = self.upload(600, 400)
+        card = image.derivatives['variants']['card']['webp']
+        image.delete()
+        # Derivatives outlive the row until its blob is collected
+        self.assertTrue(default_storage.exists(card))
+        collect_garbage(grace=timedelta(0))
+        self.assertFalse(default_storage.exists(card))
+        self.assertFalse(default_storage.exists(image.image.name))
+
+
+class MediaJobTests(TemporaryMediaMixin, TestCase):
+    def test_uploads_are_only_queued_in_the_request(self):
+        image = PropertyImage.objects.create(property=self.property, image=make_upload(800, 600))
+        self.assertEqual(image.derivatives, {})
+        self.assertEqual(
+            list(MediaJob.objects.values_list('task', 'model', 'object_id', 'status')),
+            [('image', 'properties.propertyimage', image.pk, 'queued')]
+        )
+        # Saving again before the worker runs doesn't queue a duplicate
+        image.save()
+        self.assertEqual(MediaJob.objects.count(), 1)
+
+    def test_worker_strips_exif_and_records_checksum(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'
+        image = PropertyImage.objects.create(
+            property=self.property, image=make_upload(800, 600, exif=exif.tobytes())
+        )
+        self.assertEqual(run_media_jobs(), 1)
+        image.refresh_from_db()
+        with image.image.open('rb'):
+            self.assertEqual(len(Image.open(image.image).getexif()), 0)
+            image.image.seek(0)
+            self.assertEqual(image.checksum, hashlib.sha256(image.image.read()).hexdigest())
+        self.assertEqual(MediaJob.objects.get().status, 'done')
+
+    def test_failing_jobs_back_off_then_fail(self):
+        PropertyImage.objects.create(property=self.property, image='property_images/missing.jpg')
+        run_media_jobs()
+        job = MediaJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('FileNotFoundError', job.last_error)
+        self.assertEqual(run_media_jobs(), 0)
+        for _ in range(MEDIA_JOB_ATTEMPTS - 1):
+            MediaJob.objects.update(run_after=timezone.now())
+            run_media_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', MEDIA_JOB_ATTEMPTS))
+
+    def test_only_new_files_are_queued(self):
+        video = PropertyVideo.objects.create(
+            property_instance=self.property,
+            video=SimpleUploadedFile('tour.mp4', b'not really a video', content_type='video/mp4')
+        )
+        self.owner.profile_picture = make_upload(400, 400)
+        self.owner.save()
+        MediaJob.objects.update(status='done')
+        # Edits that leave the files alone don't reprocess them
+        video = PropertyVideo.objects.get(pk=video.pk)
+        video.caption = 'Lobby'
+        video.save()
+        owner = User.objects.get(pk=self.owner.pk)
+        owner.first_name = 'Ada'
+        owner.save()
+        self.assertFalse(MediaJob.objects.filter(status='queued').exists())
+        video.video = SimpleUploadedFile('pool.mp4', b'another video', content_type='video/mp4')
+        video.save()
+        self.assertEqual(list(MediaJob.objects.filter(status='queued').values_list('task', flat=True)), ['video'])
+
+    @skipIf(shutil.which('ffmpeg'), 'ffmpeg is installed')
+    def test_video_posters_need_ffmpeg(self):
+        PropertyVideo.objects.create(
+            property_instance=self.property,
+            video=SimpleUploadedFile('tour.mp4', b'not really a video', content_type='video/mp4')
+        )
+        run_media_jobs()
+        job = MediaJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+        self.assertIn('ffmpeg is not installed', job.last_error)
+
+
+class ContentAddressedStorageTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = make_property(self.owner, name='Second Stay')
+
+    def upload(self, prop, width=640, height=480, **kwargs):
+        return PropertyImage.objects.create(property=prop, image=make_upload(width, height, **kwargs))
+
+    def refcount(self, name):
+        return MediaBlob.objects.get(name=name).refcount
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.upload(self.property, name='caption.jpg')
+        second = self.upload(self.other, name='copy of caption.jpg')
+        different = self.upload(self.other, width=320)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^property_images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertNotEqual(different.image.name, first.image.name)
+        self.assertEqual(self.refcount(first.image.name), 2)
+        self.assertEqual(MediaBlob.objects.count(), 2)
+
+        run_media_jobs()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.derivatives, second.derivatives)
+
+    def test_files_are_collected_once_unreferenced_past_the_grace_period(self):
+        first = self.upload(self.property)
+        second = self.upload(self.other)
+        name, size = first.image.name, first.image.size
+        first.delete()
+        self.assertEqual(collect_garbage(grace=timedelta(0)), (0, 0))
+        second.delete()
+        self.assertEqual(self.refcount(name), 0)
+        self.assertEqual(collect_garbage()[0], 0)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(collect_garbage(grace=timedelta(0)), (1, size))
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_replacing_an_upload_releases_the_old_file(self):
+        image = self.upload(self.property)
+        old = image.image.name
+        image.image = make_upload(320, 240)
+        image.save()
+        self.assertEqual(self.refcount(old), 0)
+        self.assertEqual(self.refcount(image.image.name), 1)
+
+    def test_stripping_metadata_moves_the_row_to_the_clean_copy(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'
+        image = self.upload(self.property, exif=exif.tobytes())
+        original = image.image.name
+        run_media_jobs()
+        image.refresh_from_db()
+        self.assertNotEqual(image.image.name, original)
+        self.assertEqual(self.refcount(original), 0)
+        self.assertEqual(self.refcount(image.image.name), 1)
+        self.assertEqual(image.derivatives['source'], image.image.name)
+
+    def test_recount_repairs_drift(self):
+        image = self.upload(self.property)
+        MediaBlob.objects.update(refcount=5)
+        self.assertEqual(recount_references(), 1)
+        self.assertEqual(self.refcount(image.image.name), 1)
+
+
+@override_settings(VIDEO_UPLOAD_CHUNK_SIZE=4)
+class VideoUploadTests(TemporaryMediaMixin, TestCase):
+    data = b'0123456789'
+
+    def setUp(self):
+        super().setUp()
+        chunk_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, chunk_dir, ignore_errors=True)
+        override = override_settings(VIDEO_UPLOAD_CHUNK_DIR=chunk_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.owner)
+
+    def start(self, **extra):
+        response = self.client.post(reverse('properties:start_video_upload', args=[self.property.pk]), {
+            'filename': 'tour.mp4', 'size': len(self.data), 'caption': 'Walkthrough', **extra,
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put_chunk(self, upload_id, index, body=None, checksum=None):
+        body = self.data[index * 4:index * 4 + 4] if body is None else body
+        return self.client.put(
+            reverse('properties:upload_video_chunk', args=[upload_id, index]),
+            body,
+            content_type='application/octet-stream',
+            headers={'X-Chunk-Checksum': checksum or hashlib.sha256(body).hexdigest()},
+        )
+
+    def complete(self, upload_id):
+        return self.client.post(reverse('properties:complete_video_upload', args=[upload_id]))
+
+    def test_chunks_can_arrive_in_any_order_and_resume(self):
+        state = self.start(checksum=hashlib.sha256(self.data).hexdigest())
+        self.assertEqual((state['chunk_size'], state['chunk_count'], state['received']), (4, 3, []))
+        upload_id = state['upload_id']
+        self.assertEqual(self.put_chunk(upload_id, 2).status_code, 200)
+        self.assertEqual(self.put_chunk(upload_id, 0).status_code, 200)
+        # Resending a chunk after a dropped response is harmless
+        self.assertEqual(self.put_chunk(upload_id, 0).status_code, 200)
+
+        status = self.client.get(reverse('properties:video_upload_status', args=[upload_id])).json()
+        self.assertEqual(status['received'], [0, 2])
+        self.assertEqual(self.complete(upload_id).status_code, 400)
+
+        self.put_chunk(upload_id, 1)
+        response = self.complete(upload_id)
+        self.assertEqual(response.json()['status'], 'complete')
+        video = PropertyVideo.objects.get(pk=response.json()['video_id'])
+        self.assertEqual(video.caption, 'Walkthrough')
+        with video.video.open('rb'):
+            self.assertEqual(video.video.read(), self.data)
+        self.assertTrue(MediaJob.objects.filter(task='video', object_id=video.pk).exists())
+        self.assertFalse(os.path.exists(os.path.join(settings.VIDEO_UPLOAD_CHUNK_DIR, upload_id)))
+        self.assertEqual(self.complete(upload_id).status_code, 400)
+
+    def test_corrupt_or_misshapen_chunks_are_rejected(self):
+        upload_id = self.start()['upload_id']
+        self.assertEqual(self.put_chunk(upload_id, 0, checksum='0' * 64).status_code, 400)
+        self.assertEqual(self.put_chunk(upload_id, 1, body=b'12').status_code, 400)
+        self.assertEqual(self.put_chunk(upload_id, 3).status_code, 400)
+        self.assertFalse(VideoUpload.objects.get(pk=upload_id).chunks.exists())
+
+    def test_whole_file_checksum_is_verified(self):
+        upload_id = self.start(checksum='f' * 64)['upload_id']
+        for index in range(3):
+            self.put_chunk(upload_id, index)
+        response = self.complete(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(VideoUpload.objects.get(pk=upload_id).status, 'uploading')
+        self.assertFalse(PropertyVideo.objects.exists())
+
+    def test_uploads_belong_to_their_vendor(self):
+        upload_id = self.start()['upload_id']
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='pw', role='vendor', is_active=True
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.put_chunk(upload_id, 0).status_code, 404)
+        response = self.client.post(reverse('properties:start_video_upload', args=[self.property.pk]), {
+            'filename': 'tour.mp4', 'size': 10,
+        })
+        self.assertEqual(response.status_code, 404)
+
+    def test_abandoned_uploads_expire(self):
+        upload_id = self.start()['upload_id']
+        self.put_chunk(upload_id, 0)
+        self.assertEqual(expire_uploads(), 0)
+        VideoUpload.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(expire_uploads(), 1)
+        self.assertFalse(os.path.exists(os.path.join(settings.VIDEO_UPLOAD_CHUNK_DIR, upload_id)))
+
+
+class VideoStreamingTests(TemporaryMediaMixin, TestCase):
+    data = bytes(range(256)) * 40
+
+    def setUp(self):
+        super().setUp()
+        self.video = PropertyVideo.objects.create(
+            property_instance=self.property,
+            video=SimpleUploadedFile('tour.mp4', self.data, content_type='video/mp4')
+        )
+        self.url = reverse('properties:stream_video', args=[self.video.pk])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_response_advertises_ranges_and_a_strong_etag(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.data)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(self.data).hexdigest()}"')
+        self.assertEqual(int(response['Content-Length']), len(self.data))
+
+    def test_videos_of_inactive_properties_are_hidden(self):
+        Property.objects.filter(pk=self.property.pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_byte_ranges(self):
+        for header, start, end in (
+            ('bytes=100-199', 100, 199),
+            ('bytes=10200-', 10200, 10239),
+            ('bytes=-10', 10230, 10239),
+            ('bytes=10000-99999', 10000, 10239),
+        ):
+            with self.subTest(header):
+                response, body = self.get(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{len(self.data)}')
+                self.assertEqual(body, self.data[start:end + 1])
+                self.assertEqual(int(response['Content-Length']), end - start + 1)
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        response, _ = self.get(Range='bytes=20000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+        # Several ranges at once are answered with the whole file
+        response, body = self.get(Range='bytes=0-1,5-6')
+        self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_conditional_requests(self):
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get(**{'If-None-Match': etag})[0].status_code, 304)
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': etag})[0].status_code, 206)
+        # A stale validator gets the current file in full
+        response, body = self.get(Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_detail_page_plays_through_the_stream(self):
+        response = self.client.get(reverse('properties:property_detail', args=[self.property.pk]))
+        self.assertContains(response, self.url)
+
+
+class GalleryTests(TemporaryMediaMixin, TestCase):
+    def add_video(self, link):
+        return PropertyVideo.objects.create(property_instance=self.property, youtube_link=link)
+
+    def test_youtube_ids_are_parsed_on_save(self):
+        for link, youtube_id in (
+            ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10', 'dQw4w9WgXcQ'),
+            ('https://youtu.be/dQw4w9WgXcQ?si=share', 'dQw4w9WgXcQ'),
+            ('https://www.youtube.com/embed/dQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+            ('https://vimeo.com/123', ''),
+        ):
+            with self.subTest(link):
+                self.assertEqual(self.add_video(link).youtube_id, youtube_id)
+        video = PropertyVideo.objects.first()
+        video.youtube_link = 'https://youtu.be/abcdefghijk'
+        video.save(update_fields=['youtube_link'])
+        video.refresh_from_db()
+        self.assertEqual(video.youtube_id, 'abcdefghijk')
+
+    def test_pages_run_from_photos_into_videos(self):
+        first = PropertyImage.objects.create(property=self.property, image=make_upload(40, 30, name='a.jpg'))
+        primary = PropertyImage.objects.create(
+            property=self.property, image=make_upload(50, 30, name='b.jpg'), is_primary=True
+        )
+        video = self.add_video('https://youtu.be/dQw4w9WgXcQ')
+        self.add_video('https://vimeo.com/123')
+        url = reverse('properties:property_gallery', args=[self.property.pk])
+
+        page = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual([item['id'] for item in page['items']], [f'image-{primary.pk}', f'image-{first.pk}'])
+        self.assertEqual((page['total'], page['next_offset']), (3, 2))
+        page = self.client.get(url, {'offset': 2, 'limit': 2}).json()
+        self.assertEqual(page['items'], [{
+            'type': 'video', 'id': f'video-{video.pk}', 'url': 'https://www.youtube.com/embed/dQw4w9WgXcQ',
+            'youtube': True, 'poster': '', 'caption': '',
+        }])
+        self.assertIsNone(page['next_offset'])
+        self.assertEqual(self.client.get(url, {'limit': 500}).status_code, 400)
+
+    def test_detail_page_ships_only_the_first_item(self):
+        primary = PropertyImage.objects.create(
+            property=self.property, image=make_upload(50, 30, name='b.jpg'), is_primary=True
+        )
+        PropertyImage.objects.create(property=self.property, image=make_upload(40, 30, name='a.jpg'))
+        detail = reverse('properties:property_detail', args=[self.property.pk])
+
+        def page_queries():
+            get_cache().clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(detail)
+            return response, len(queries)
+
+        self.add_video('https://youtu.be/dQw4w9WgXcQ')
+        response, baseline = page_queries()
+        initial = re.search(r'id="gallery-initial"[^>]*>(.*?)</script>', response.content.decode()).group(1)
+        self.assertEqual([item['id'] for item in json.loads(initial)], [f'image-{primary.pk}'])
+        for _ in range(4):
+            self.add_video('https://youtu.be/dQw4w9WgXcQ')
+        # No more per-video queries
+        self.assertEqual(page_queries()[1], baseline)
+
+
+class MediaWorkerPoolTests(TemporaryMediaMixin, TransactionTestCase):
+    def test_pool_processes_jobs_in_other_processes(self):
+        images = [
+            PropertyImage.objects.create(property=self.property, image=make_upload(900, 600, name=f'{i}.jpg'))
+            for i in range(3)
+        ]
+        pool = start_pool(2)
+        try:
+            self.assertEqual(run_media_jobs(pool=pool), 3)
+        finally:
+            pool.shutdown()
+        self.assertEqual(set(MediaJob.objects.values_list('status', flat=True)), {'done'})
+        for image in images:
+            image.refresh_from_db()
+            self.assertTrue(image.has_derivatives)
+
+
+class QueryPlanTests(TestCase):
+    """Hot pages must reach every table through an index, never a full scan.
+
+    Each view is rendered against a seeded dataset, and every SELECT it
+    issues is run through the database's EXPLAIN.
+    """
+
+    APP_TABLES = ('properties_', 'bookings_', 'accounts_')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = User.objects.create_user(
+            username='vendor', email='vendor@example.com', password='pw', role='vendor', is_active=True
+        )
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        guests = [
+            User.objects.create_user(username=f'guest{i}', email=f'guest{i}@example.com', password='pw')
+            for i in range(5)
+        ]
+        check_in = timezone.now().date() + timedelta(days=5)
+        for i in range(24):
+            owner = cls.vendor if i % 2 else other
+            prop = make_property(
+                owner, name=f'Stay {i}', is_featured=i % 3 == 0,
+                latitude=Decimal('-15.4') + Decimal('0.01') * i, longitude=Decimal('28.3'),
+            )
+            room = make_room(prop, total_rooms=3)
+            make_room(prop, room_type='suite', price_per_night=300)
+            PropertyImage.objects.create(property=prop, image=f'property_images/{i}.jpg', is_primary=True)
+            PropertyImage.objects.create(property=prop, image=f'property_images/{i}b.jpg')
+            for guest in guests[:3]:
+                Review.objects.create(property=prop, user=guest, rating=4, title='Nice', comment='Nice')
+                make_booking(guest, room, check_in + timedelta(days=i % 4))
+        cls.property = prop
+
+    def setUp(self):
+        get_cache().clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables make sequential scans look cheap; only
+                # fall back to one when no index can serve the query
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+    def full_scans(self, plan):
+        if connection.vendor == 'postgresql':
+            pattern = r'Seq Scan on (\w+)'
+        else:
+            pattern = r'\bSCAN (\w+)$'
+        return [
+            line for line in plan
+            for table in re.findall(pattern, line)
+            if table.startswith(self.APP_TABLES)
+        ]
+
+    def assertNoFullScans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            plan = self.explain(sql)
+            self.assertEqual(self.full_scans(plan), [], f'Full table scan in:\n{sql}\n' + '\n'.join(plan))
+
+    def test_check_availability(self):
+        self.assertNoFullScans(reverse('properties:check_availability'), {
+            'room_type': 'double',
+            'property_id': self.property.pk,
+            'check_in': (timezone.now().date() + timedelta(days=5)).isoformat(),
+            'check_out': (timezone.now().date() + timedelta(days=8)).isoformat(),
+        })
+
+    def test_home_view(self):
+        self.assertNoFullScans(reverse('properties:home'))
+
+    def test_property_list_view(self):
+        self.assertNoFullScans(reverse('properties:property_list'))
+        self.assertNoFullScans(reverse('properties:property_list'), {'type': 'lodge'})
+        self.assertNoFullScans(reverse('properties:property_list'), {'search': 'stay'})
+        self.assertNoFullScans(reverse('properties:property_list'), {'sort': 'rating'})
+        self.assertNoFullScans(reverse('properties:property_list'), {'lat': '-15.3', 'lng': '28.3', 'radius': '20'})
+
+    def test_property_availability(self):
+        self.assertNoFullScans(reverse('properties:property_availability', args=[self.property.pk]))
+
+    def test_property_map(self):
+        self.assertNoFullScans(reverse('properties:property_map'), {'bbox': '-15.5,28.2,-15.1,28.4'})
+
+    def test_vendor_dashboard(self):
+        self.client.force_login(self.vendor)
+        self.assertNoFullScans(reverse('properties:vendor_dashboard'))
+        self.assertNoFullScans(reverse('accounts:vendor_dashboard'))
@@ -0,0 +1,173 @@
+"""Resumable property video uploads sent in fixed-size chunks.
+
+A vendor starts an upload with the file's name and size and gets back the
+chunk size to use, VIDEO_UPLOAD_CHUNK_SIZE. Each chunk is sent on its own with a SHA-256 checksum
+and written to VIDEO_UPLOAD_CHUNK_DIR, so a dropped connection only costs
+the chunk in flight; asking for the upload's state lists the chunks the
+server already has. Once every chunk is in, they are streamed into one
+temporary file, which becomes the ``PropertyVideo``'s file.
+"""
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PropertyVideo, VideoUpload, VideoUploadChunk
+
+MAX_VIDEO_SIZE = 4 * 1024 * 1024 * 1024
+# Incomplete uploads untouched this long are abandoned
+UPLOAD_EXPIRY = timedelta(days=1)
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadError(ValueError):
+    pass
+
+
+def chunk_dir(upload):
+    return os.path.join(settings.VIDEO_UPLOAD_CHUNK_DIR, str(upload.pk))
+
+
+def chunk_path(upload, index):
+    return os.path.join(chunk_dir(upload), str(index))
+
+
+def start_upload(property_obj, owner, filename, size, caption='', checksum=''):
+    if not filename:
+        raise UploadError('A filename is required')
+    if not 0 < size <= MAX_VIDEO_SIZE:
+        raise UploadError(f'Videos must be between 1 byte and {MAX_VIDEO_SIZE} bytes')
+    return VideoUpload.objects.create(
+        property_instance=property_obj,
+        owner=owner,
+        filename=os.path.basename(filename),
+        caption=caption,
+        size=size,
+        chunk_size=settings.VIDEO_UPLOAD_CHUNK_SIZE,
+        checksum=checksum.lower(),
+    )
+
+
+def store_chunk(upload, index, stream, length, checksum):
+    """Write chunk ``index`` from ``stream``, verifying its size and checksum.
+
+    Sending a chunk again replaces it, so clients can retry freely.
+    """
+    if upload.status != 'uploading':
+        raise UploadError('This upload is no longer accepting chunks')
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError(f'Chunk index must be between 0 and {upload.chunk_count - 1}')
+    expected = upload.expected_chunk_size(index)
+    if length != expected:
+        raise UploadError(f'Chunk {index} must be {expected} bytes, got {length}')
+    if not checksum:
+        raise UploadError('A SHA-256 checksum of the chunk is required')
+
+    os.makedirs(chunk_dir(upload), exist_ok=True)
+    path = chunk_path(upload, index)
+    partial = f'{path}.{uuid.uuid4().hex}.part'
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        with open(partial, 'wb') as out:
+            while received < length:
+                block = stream.read(min(COPY_BUFFER_SIZE, length - received))
+                if not block:
+                    break
+                digest.update(block)
+                out.write(block)
+                received += len(block)
+        if received != length:
+            raise UploadError(f'Chunk {index} ended after {received} of {length} bytes')
+        if digest.hexdigest() != checksum.lower():
+            raise UploadError(f'Chunk {index} does not match its checksum')
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+
+    VideoUploadChunk.objects.update_or_create(
+        upload=upload, index=index, defaults={'size': length, 'checksum': digest.hexdigest()}
+    )
+    # Keeps an upload that is still making progress from expiring
+    VideoUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+
+
+def complete_upload(upload):
+    """Assemble the chunks into the upload's ``PropertyVideo`` and return it."""
+    received = upload.chunks.count()
+    if received != upload.chunk_count:
+        raise UploadError(f'{upload.chunk_count - received} chunks are still missing')
+    # Only one request gets to assemble a given upload
+    if not VideoUpload.objects.filter(pk=upload.pk, status='uploading').update(
+        status='assembling', updated_at=timezone.now()
+    ):
+        raise UploadError('This upload is already complete')
+
+    try:
+        assembled = TemporaryUploadedFile(upload.filename, 'application/octet-stream', upload.size, None)
+        try:
+            digest = hashlib.sha256()
+            for index in range(upload.chunk_count):
+                with open(chunk_path(upload, index), 'rb') as chunk:
+                    while block := chunk.read(COPY_BUFFER_SIZE):
+                        digest.update(block)
+                        assembled.write(block)
+            assembled.flush()
+            if upload.checksum and digest.hexdigest() != upload.checksum:
+                raise UploadError('The assembled video does not match its checksum')
+            video = PropertyVideo(property_instance=upload.property_instance, caption=upload.caption)
+            # Stored before the row, so a failed save leaves an unreferenced
+            # blob for garbage collection rather than an untracked file
+            video.video.save(upload.filename, assembled, save=False)
+            with transaction.atomic():
+                video.save()
+                VideoUpload.objects.filter(pk=upload.pk).update(status='complete', video=video)
+        finally:
+            assembled.close()
+    except Exception:
+        VideoUpload.objects.filter(pk=upload.pk).update(status='uploading')
+        raise
+
+    discard_chunks(upload)
+    upload.status, upload.video = 'complete', video
+    return video
+
+
+def discard_chunks(upload):
+    shutil.rmtree(chunk_dir(upload), ignore_errors=True)
+    upload.chunks.all().delete()
+
+
+def expire_uploads(max_age=UPLOAD_EXPIRY):
+    """Delete incomplete uploads idle for longer than ``max_age``, returning how many.
+
+    That includes uploads whose assembly was cut short by a crash.
+    """
+    stale = VideoUpload.objects.filter(
+        status__in=('uploading', 'assembling'), updated_at__lt=timezone.now() - max_age
+    )
+    expired = 0
+    for upload in stale:
+        discard_chunks(upload)
+        upload.delete()
+        expired += 1
+    return expired
+
+
+def upload_state(upload):
+    return {
+        'upload_id': str(upload.pk),
+        'status': upload.status,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'chunk_count': upload.chunk_count,
+        'received': list(upload.chunks.order_by('index').values_list('index', flat=True)),
+        'video_id': upload.video_id,
+    }
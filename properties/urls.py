@@ -29,6 +29,17 @@ urlpatterns = [
 
     # urls.py - Add this pattern
     path('availability/check/', views.check_availability, name='check_availability'),
+    path('availability/search/', views.search_availability, name='search_availability'),
+    path('<int:pk>/availability/', views.property_availability, name='property_availability'),
 
     path('vendor/dashboard/', views.vendor_dashboard, name='vendor_dashboard'),
+    path('vendor/occupancy/', views.vendor_occupancy, name='vendor_occupancy'),
+
+    path('map/', views.property_map, name='property_map'),
+    path('<int:pk>/gallery/', views.property_gallery, name='property_gallery'),
+    path('videos/<int:pk>/stream/', views.stream_video, name='stream_video'),
+    path('<int:property_pk>/videos/uploads/', views.start_video_upload, name='start_video_upload'),
+    path('videos/uploads/<uuid:upload_id>/', views.video_upload_status, name='video_upload_status'),
+    path('videos/uploads/<uuid:upload_id>/chunks/<int:index>/', views.upload_video_chunk, name='upload_video_chunk'),
+    path('videos/uploads/<uuid:upload_id>/complete/', views.complete_video_upload, name='complete_video_upload'),
 ]
\ No newline at end of file
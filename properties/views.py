@@ -1,14 +1,30 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Avg, Sum, Count, Min
+from django.db.models import Q, Sum, Count, F, OuterRef, Prefetch, Subquery
 from django.core.paginator import Paginator
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, TemplateView
 from django.urls import reverse_lazy
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_GET, require_POST, require_http_methods, require_safe
 
 from bookings.models import Booking
-from .models import Property, Room, Review, PropertyImage
+from bookings.availability import CALENDAR_DAYS, availability_calendar, cheapest_free_rooms, find_available_room
+from bookings.occupancy import occupancy
+from bookings.rollups import ROLLUP_FIELDS, rollup_totals
+from .models import Property, Room, Review, PropertyImage, PropertyVideo, VideoUpload
 from .forms import PropertyForm, RoomForm, ReviewForm
+from .search import search_properties
+from .featured import get_featured_stays
+from .caching import PROPERTY_LIST_TAG, property_page_tags, property_tag
+from .uploads import complete_upload, start_upload, store_chunk, upload_state
+from .streaming import stream_file
+from .gallery import GALLERY_PAGE_SIZE, MAX_GALLERY_PAGE_SIZE, gallery_page
+from .geo import clusters, nearby, parse_box, parse_point, parse_radius
+from .facets import facet_counts, facet_filters, selected_facets
+from .lookups import listed_cities
+from pano.caching import CacheForAnonymousMixin, cache_for_anonymous
+from pano.pagination import KeysetPaginationMixin
 from django.urls import reverse_lazy
 # views.py (add this to your existing views)
 from django.views.generic import TemplateView
@@ -20,103 +36,87 @@ class HomeView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
-        # Get featured properties with their average ratings and review count
-        # I've added an annotation for min_price, which we will use in the template.
-        # I've also pre-fetched the primary image for each property.
-        featured_properties = Property.objects.filter(
-            is_active=True,
-            is_featured=True
-        ).annotate(
-            avg_rating=Avg('reviews__rating'),
-            review_count=Count('reviews'),
-            min_price=Min('room__price_per_night')
-        ).prefetch_related('images').order_by('-avg_rating')[:6]
-
-        # Now we need to process the queryset to get the primary image URL and amenities
-        properties_with_data = []
-        for prop in featured_properties:
-            # Find the primary image or a fallback
-            primary_image_url = ''
-            primary_image = prop.images.filter(is_primary=True).first()
-            if primary_image:
-                primary_image_url = primary_image.image.url
-            elif prop.images.first():
-                primary_image_url = prop.images.first().image.url
-
-            # Collect amenities
-            amenities = []
-            if prop.wifi:
-                amenities.append('Free WiFi')
-            if prop.parking:
-                amenities.append('Free Parking')
-            if prop.restaurant:
-                amenities.append('Restaurant')
-            # Add other amenities as needed
-
-            properties_with_data.append({
-                'id': prop.id,
-                'title': prop.name,
-                'location': f"{prop.city}, {prop.country}",
-                'type': prop.property_type,
-                'rating': prop.avg_rating or 0,
-                'reviews': prop.review_count,
-                'price': prop.min_price or 0,
-                'image_url': primary_image_url,
-                'amenities': amenities,
-                'url': prop.get_absolute_url(),
-            })
-        
-        context['featured_stays'] = properties_with_data
+        # Built from a fixed number of queries and cached until a featured
+        # property, or one of its images, rooms or reviews, changes
+        context['featured_stays'] = get_featured_stays()
         return context
 
-class PropertyListView(ListView):
+class PropertyListView(CacheForAnonymousMixin, KeysetPaginationMixin, ListView):
     model = Property
     template_name = 'properties/property_list.html'
     context_object_name = 'properties'
     paginate_by = 12
     
+    # Sort options, all served by summary columns on Property; pages seek
+    # past the last row's sort key, with pk breaking ties
+    SORT_ORDERS = {
+        'newest': ['-created_at'],
+        'rating': [F('avg_rating').desc(nulls_last=True), '-created_at'],
+        'price_low': [F('min_price').asc(nulls_last=True), '-created_at'],
+        'price_high': [F('min_price').desc(nulls_last=True), '-created_at'],
+        'reviews': ['-review_count', '-created_at'],
+    }
+    
+    def get_cache_tags(self):
+        return [PROPERTY_LIST_TAG]
+    
     def get_queryset(self):
-        queryset = Property.objects.filter(is_active=True).annotate(
-            avg_rating=Avg('reviews__rating')
-        )
+        # No joins or GROUP BY, so each page can walk the partial is_active index
+        queryset = Property.objects.filter(is_active=True).order_by(*self.SORT_ORDERS['newest'])
         
-        # Search functionality
+        # Search functionality, ranked by relevance
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(city__icontains=search) | 
-                Q(description__icontains=search)
-            )
+            queryset = search_properties(queryset, search)
+        
+        # Near a point, nearest first
+        lat, lng = self.request.GET.get('lat'), self.request.GET.get('lng')
+        if lat and lng:
+            try:
+                queryset = nearby(queryset, *parse_point(lat, lng), parse_radius(self.request.GET.get('radius')))
+            except ValueError:
+                pass
         
-        # Filter by property type
-        property_type = self.request.GET.get('type')
-        if property_type:
-            queryset = queryset.filter(property_type=property_type)
+        # An explicit sort wins over relevance and distance
+        sort = self.request.GET.get('sort')
+        if sort in self.SORT_ORDERS:
+            queryset = queryset.order_by(*self.SORT_ORDERS[sort])
         
         # Filter by city
         city = self.request.GET.get('city')
         if city:
             queryset = queryset.filter(city__icontains=city)
-            
-        return queryset
+        
+        # Amenity, type, price and rating facets, counted from the results
+        # before any of them is applied
+        self.selected_facets = selected_facets(self.request.GET, Property.PROPERTY_TYPES)
+        self.unfaceted_queryset = queryset
+        return queryset.filter(*facet_filters(self.selected_facets, Property.PROPERTY_TYPES).values())
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['facets'] = facet_counts(self.unfaceted_queryset, self.selected_facets, Property.PROPERTY_TYPES)
+        context['cities'] = listed_cities()
+        return context
 
 # views.py - Update PropertyDetailView
 from datetime import datetime, timedelta
 from django.utils import timezone
 from django.db.models import Q
 
-class PropertyDetailView(DetailView):
+class PropertyDetailView(CacheForAnonymousMixin, DetailView):
     model = Property
     template_name = 'properties/property_detail.html'
     context_object_name = 'property'
     
+    def get_cache_tags(self):
+        return property_page_tags(self.kwargs['pk'])
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['rooms'] = self.object.room_set.filter(is_available=True)
-        context['reviews'] = self.object.reviews.all().order_by('-created_at')
-        context['avg_rating'] = self.object.reviews.aggregate(Avg('rating'))['rating__avg']
+        context['reviews'] = self.object.reviews.select_related('user').order_by('-created_at')
+        context['avg_rating'] = self.object.avg_rating
         
         # Get unique room types
         room_types = self.object.room_set.filter(is_available=True).values(
@@ -124,11 +124,13 @@ class PropertyDetailView(DetailView):
         ).distinct()
         context['room_types'] = room_types
         
-        # Generate calendar data for next two months
-        today = timezone.now().date()
-        next_month = today + timedelta(days=60)
+        # The window the availability calendar covers
+        today = timezone.localdate()
         context['calendar_start'] = today
-        context['calendar_end'] = next_month
+        context['calendar_end'] = today + timedelta(days=CALENDAR_DAYS - 1)
+        
+        # Only needed when the gallery fragment isn't cached
+        context['gallery'] = SimpleLazyObject(lambda: gallery_page(self.object.pk, limit=1))
         
         return context
     
@@ -136,7 +138,7 @@ class PropertyDetailView(DetailView):
 
 
 # views.py - Add this view
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 import json
 from datetime import datetime
 
@@ -153,36 +155,87 @@ def check_availability(request):
         check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
         check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
         
-        # Find available rooms of the selected type
-        available_rooms = Room.objects.filter(
-            property_id=property_id,
-            room_type=room_type,
-            is_available=True
-        )
+        # One query over the room-night ledger instead of a scan per room
+        room = find_available_room(property_id, room_type, check_in_date, check_out_date)
         
-        # Check for conflicting bookings
-        for room in available_rooms:
-            conflicting_bookings = Booking.objects.filter(
-                room=room,
-                status__in=['confirmed', 'pending'],
-                check_in_date__lt=check_out_date,
-                check_out_date__gt=check_in_date
-            )
-            
-            if not conflicting_bookings.exists():
-                # Room is available
-                total_nights = (check_out_date - check_in_date).days
-                return JsonResponse({
-                    'available': True,
-                    'room_id': room.id,
-                    'price': float(room.price_per_night),
-                    'total_nights': total_nights
-                })
+        if room:
+            total_nights = (check_out_date - check_in_date).days
+            return JsonResponse({
+                'available': True,
+                'room_id': room.id,
+                'price': float(room.price_per_night),
+                'total_nights': total_nights,
+                'units_available': room.free_units
+            })
         
         return JsonResponse({'available': False})
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
+
+
+# Upper bound on properties per batch so one request can't scan the catalogue
+MAX_BATCH_PROPERTIES = 50
+
+def search_availability(request):
+    """Availability and cheapest free room for a whole page of properties.
+
+    Takes ``check_in``, ``check_out``, ``guests`` and either a comma-separated
+    ``property_ids`` list or a ``search`` term, and answers from a fixed number
+    of queries however many properties are requested.
+    """
+    check_in = request.GET.get('check_in')
+    check_out = request.GET.get('check_out')
+    property_ids = request.GET.get('property_ids')
+    search = request.GET.get('search')
+    
+    if not all([check_in, check_out]) or not (property_ids or search):
+        return JsonResponse({'error': 'Missing parameters'}, status=400)
+    
+    try:
+        check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
+        check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
+        guests = int(request.GET.get('guests', 1))
+        if check_out_date <= check_in_date:
+            raise ValueError('Check-out date must be after check-in date.')
+        
+        properties = Property.objects.filter(is_active=True).order_by('pk')
+        if property_ids:
+            properties = properties.filter(pk__in=[int(pk) for pk in property_ids.split(',') if pk.strip()])
+        if search:
+            properties = search_properties(properties, search)
+        requested = list(properties.values_list('pk', flat=True)[:MAX_BATCH_PROPERTIES])
+        
+        total_nights = (check_out_date - check_in_date).days
+        cheapest = cheapest_free_rooms(requested, check_in_date, check_out_date, guests)
+        
+        results = []
+        for property_id in requested:
+            room = cheapest.get(property_id)
+            if room is None:
+                results.append({'property_id': property_id, 'available': False})
+                continue
+            results.append({
+                'property_id': property_id,
+                'available': True,
+                'room_id': room.id,
+                'room_name': room.name,
+                'room_type': room.room_type,
+                'price': float(room.price_per_night),
+                'total_price': float(room.price_per_night * total_nights),
+                'units_available': room.free_units
+            })
+        
+        return JsonResponse({
+            'check_in': check_in,
+            'check_out': check_out,
+            'guests': guests,
+            'total_nights': total_nights,
+            'results': results
+        })
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
 
 
@@ -286,14 +339,38 @@ def add_review(request, property_pk):
     })
 
 #@method_decorator(login_required, name='dispatch')
-class VendorPropertyListView(ListView):
+class VendorPropertyListView(KeysetPaginationMixin, ListView):
     model = Property
     template_name = 'properties/vendor/property_list.html'
     context_object_name = 'properties'
     paginate_by = 10
     
     def get_queryset(self):
-        return Property.objects.filter(owner=self.request.user)
+        first_image = PropertyImage.objects.filter(property=OuterRef('property')).order_by('pk').values('pk')[:1]
+        return Property.objects.filter(owner=self.request.user).annotate(
+            room_count=Count('room'),
+        ).prefetch_related(
+            Prefetch('images', queryset=PropertyImage.objects.filter(pk=Subquery(first_image)), to_attr='thumbnails')
+        ).order_by('-created_at')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Totals cover every property, not just the page shown
+        properties = Property.objects.filter(owner=self.request.user)
+        stats = properties.aggregate(
+            total_properties=Count('pk'),
+            rated_reviews=Sum('review_count', filter=Q(avg_rating__isnull=False)),
+            rating_total=Sum(F('avg_rating') * F('review_count')),
+        )
+        context['total_properties'] = stats['total_properties']
+        context['total_rooms'] = Room.objects.filter(property__owner=self.request.user).count()
+        context['confirmed_bookings'] = Booking.objects.filter(
+            room__property__owner=self.request.user, status='confirmed'
+        ).count()
+        context['average_rating'] = (
+            stats['rating_total'] / stats['rated_reviews'] if stats['rated_reviews'] else None
+        )
+        return context
     
     def dispatch(self, request, *args, **kwargs):
         if request.user.role != 'vendor':
@@ -321,8 +398,8 @@ def vendor_property_detail(request, pk):
         total=Sum('total_amount')
     )['total'] or 0
     
-    # Calculate average rating
-    avg_rating = property.reviews.aggregate(Avg('rating'))['rating__avg']
+    # Average rating is kept up to date on the property itself
+    avg_rating = property.avg_rating
     
     context = {
         'property': property,
@@ -337,52 +414,57 @@ def vendor_property_detail(request, pk):
     return render(request, 'properties/vendor/property_detail.html', context)
 
 
+# Trailing window for the dashboard's occupancy figure
+OCCUPANCY_WINDOW_DAYS = 30
+
 @login_required
 def vendor_dashboard(request):
     if request.user.role != 'vendor':
         messages.error(request, 'Access denied. Vendor account required.')
         return redirect('home')
     
-    # Get vendor's properties
-    properties = Property.objects.filter(owner=request.user)
+    first_image = PropertyImage.objects.filter(property=OuterRef('property')).order_by('pk').values('pk')[:1]
     
-    # Calculate statistics
-    total_properties = properties.count()
-    total_rooms = Room.objects.filter(property__owner=request.user).count()
-    
-    # Get all bookings for vendor's properties
-    bookings = Booking.objects.filter(room__property__owner=request.user)
-    total_bookings = bookings.count()
-    confirmed_bookings = bookings.filter(status='confirmed').count()
-    pending_bookings = bookings.filter(status='pending').count()
-    
-    # Calculate total revenue
-    total_revenue = bookings.filter(status='confirmed').aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
+    # Room counts in one grouped query; booking figures come from the daily
+    # rollups rather than the vendor's full booking history
+    properties = Property.objects.filter(owner=request.user).annotate(
+        room_count=Count('room'),
+    ).prefetch_related(
+        Prefetch('images', queryset=PropertyImage.objects.filter(pk=Subquery(first_image)), to_attr='thumbnails')
+    ).order_by('-created_at')
+    rollups = rollup_totals(request.user)
     
-    # Get recent bookings (last 5)
-    recent_bookings = bookings.order_by('-created_at')[:5]
-    
-    # Get properties with their booking counts
     properties_with_stats = []
+    totals = dict.fromkeys(ROLLUP_FIELDS, 0)
     for property in properties:
-        property_bookings = bookings.filter(room__property=property)
-        property_revenue = property_bookings.filter(status='confirmed').aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        
+        rollup = rollups.get(property.pk, {})
+        for field in ROLLUP_FIELDS:
+            totals[field] += rollup.get(field, 0)
         properties_with_stats.append({
             'property': property,
-            'booking_count': property_bookings.count(),
-            'revenue': property_revenue,
-            'room_count': property.room_set.count()
+            'booking_count': rollup.get('bookings', 0),
+            'revenue': rollup.get('revenue', 0),
+            'room_count': property.room_count,
         })
+    total_properties = len(properties_with_stats)
+    total_rooms = sum(stat['room_count'] for stat in properties_with_stats)
+    total_bookings = totals['bookings']
+    confirmed_bookings = totals['confirmed']
+    pending_bookings = totals['pending']
+    total_revenue = totals['revenue']
     
-    # Get occupancy rate (simplified)
-    total_room_nights = sum(booking.total_nights for booking in bookings.filter(status='confirmed'))
-    available_room_nights = 365 * total_rooms  # Simplified calculation
-    occupancy_rate = (total_room_nights / available_room_nights * 100) if available_room_nights > 0 else 0
+    # Get recent bookings (last 5)
+    recent_bookings = Booking.objects.filter(
+        room__property__owner=request.user
+    ).select_related('room__property').order_by('-created_at')[:5]
+    
+    # Share of unit-nights sold over the last OCCUPANCY_WINDOW_DAYS
+    today = timezone.now().date()
+    occupancy_rate = occupancy(
+        Property.objects.filter(owner=request.user),
+        today - timedelta(days=OCCUPANCY_WINDOW_DAYS),
+        today
+    )['rate']
     
     context = {
         'total_properties': total_properties,
@@ -396,4 +478,179 @@ def vendor_dashboard(request):
         'occupancy_rate': occupancy_rate
     }
     
-    return render(request, 'properties/vendor/dashboard.html', context)
\ No newline at end of file
+    return render(request, 'properties/vendor/dashboard.html', context)
+
+
+# Longest window the occupancy endpoint will chart in one request
+MAX_OCCUPANCY_DAYS = 366
+
+@login_required
+def vendor_occupancy(request):
+    """Daily occupancy series for the vendor's properties, or one of them.
+
+    Takes optional ``start`` and ``end`` dates (end exclusive, defaulting to
+    the last OCCUPANCY_WINDOW_DAYS) and an optional ``property_id``.
+    """
+    if request.user.role != 'vendor':
+        return JsonResponse({'error': 'Vendor account required'}, status=403)
+    
+    try:
+        today = timezone.now().date()
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if request.GET.get('end') else today
+        start = (
+            datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start')
+            else end - timedelta(days=OCCUPANCY_WINDOW_DAYS)
+        )
+        if not 0 < (end - start).days <= MAX_OCCUPANCY_DAYS:
+            raise ValueError(f'The window must span 1 to {MAX_OCCUPANCY_DAYS} days')
+        
+        properties = Property.objects.filter(owner=request.user)
+        if request.GET.get('property_id'):
+            properties = properties.filter(pk=int(request.GET['property_id']))
+        
+        stats = occupancy(properties, start, end)
+        return JsonResponse({
+            'start': start,
+            'end': end,
+            'sold': stats['sold'],
+            'available': stats['available'],
+            'rate': stats['rate'],
+            'days': stats['days'],
+        })
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@cache_for_anonymous(lambda request, pk: [property_tag(pk), property_tag(pk, 'media')], timeout=60 * 10)
+def property_gallery(request, pk):
+    """A page of a property's gallery, from ``offset`` (default 0) for ``limit`` items."""
+    try:
+        offset = int(request.GET.get('offset', 0))
+        limit = int(request.GET.get('limit', GALLERY_PAGE_SIZE))
+        if offset < 0 or not 0 < limit <= MAX_GALLERY_PAGE_SIZE:
+            raise ValueError(f'offset must be positive and limit between 1 and {MAX_GALLERY_PAGE_SIZE}')
+        return JsonResponse(gallery_page(pk, offset, limit))
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@require_GET
+def property_availability(request, pk):
+    """Free units per night for each room type over the calendar window.
+
+    The calendar greys out sold-out nights from this one response instead
+    of checking each date the guest picks.
+    """
+    return JsonResponse(availability_calendar(pk))
+
+
+@require_GET
+@cache_for_anonymous(lambda request: [PROPERTY_LIST_TAG], timeout=60 * 5)
+def property_map(request):
+    """Clustered markers for the active properties inside the ``bbox`` viewport."""
+    try:
+        # The list's facets narrow the map too
+        selected = selected_facets(request.GET, Property.PROPERTY_TYPES)
+        queryset = Property.objects.filter(
+            *facet_filters(selected, Property.PROPERTY_TYPES).values(), is_active=True
+        )
+        return JsonResponse({'clusters': clusters(queryset, *parse_box(request.GET.get('bbox', '')))})
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@require_safe
+def stream_video(request, pk):
+    """A self-hosted property video, with byte ranges for seeking."""
+    video = get_object_or_404(PropertyVideo, pk=pk, property_instance__is_active=True)
+    if not video.video:
+        raise Http404('This video is hosted elsewhere')
+    try:
+        return stream_file(request, video.video)
+    except FileNotFoundError:
+        raise Http404('Video file not found')
+
+
+# Resumable video uploads, see properties.uploads for the protocol
+
+def vendor_upload(request, upload_id):
+    return VideoUpload.objects.filter(pk=upload_id, owner=request.user).select_related('property_instance').first()
+
+@login_required
+@require_POST
+def start_video_upload(request, property_pk):
+    """Begin a chunked upload of a video for one of the vendor's properties.
+
+    Takes ``filename``, ``size`` in bytes, and optional ``caption`` and
+    ``checksum`` (SHA-256 of the whole file). Returns the upload's state,
+    including the ``chunk_size`` every chunk but the last must have.
+    """
+    property_obj = Property.objects.filter(pk=property_pk, owner=request.user).first()
+    if property_obj is None:
+        return JsonResponse({'error': 'Property not found'}, status=404)
+    
+    try:
+        upload = start_upload(
+            property_obj,
+            request.user,
+            request.POST.get('filename', ''),
+            int(request.POST.get('size', 0)),
+            caption=request.POST.get('caption', ''),
+            checksum=request.POST.get('checksum', ''),
+        )
+        return JsonResponse(upload_state(upload), status=201)
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+@require_GET
+def video_upload_status(request, upload_id):
+    """The upload's state; ``received`` lists the chunks to skip when resuming."""
+    upload = vendor_upload(request, upload_id)
+    if upload is None:
+        return JsonResponse({'error': 'Upload not found'}, status=404)
+    return JsonResponse(upload_state(upload))
+
+@login_required
+@require_http_methods(['PUT'])
+def upload_video_chunk(request, upload_id, index):
+    """Store one chunk, sent as the raw request body.
+
+    The ``X-Chunk-Checksum`` header carries the chunk's SHA-256. The body is
+    streamed to disk, never read into memory whole.
+    """
+    upload = vendor_upload(request, upload_id)
+    if upload is None:
+        return JsonResponse({'error': 'Upload not found'}, status=404)
+    
+    try:
+        store_chunk(
+            upload,
+            index,
+            request,
+            int(request.META.get('CONTENT_LENGTH') or 0),
+            request.headers.get('X-Chunk-Checksum', ''),
+        )
+        return JsonResponse({'index': index, 'received': upload.chunks.count()})
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+@require_POST
+def complete_video_upload(request, upload_id):
+    """Assemble a fully uploaded video into a new ``PropertyVideo``."""
+    upload = vendor_upload(request, upload_id)
+    if upload is None:
+        return JsonResponse({'error': 'Upload not found'}, status=404)
+    
+    try:
+        complete_upload(upload)
+        return JsonResponse(upload_state(upload))
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)